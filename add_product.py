@@ -2,76 +2,64 @@ import streamlit as st
 import pandas as pd
 import os
 from datetime import datetime
-import random
-import barcode
-from barcode.writer import ImageWriter
 import io
-
-INVENTORY_FILE = os.path.join(os.path.dirname(__file__), "inventory.xlsx")
+from barcode_utils import clean_barcode
+from barcode_allocator import get_allocator
+from barcode_images import render_barcode
+from field_stats import get_field_stats
+from key_index import get_key_index
+from stock_count import SCAN_FILE_TYPES, preview_scan_file, reconcile_scan_file, summarize
+from framecode_sequence import framecode_prefix, reserve_framecodes, observe_framecode, reset_framecode_counters
+from inventory_storage import get_table, strip_derived_columns, RowConflict, DERIVED_COLUMNS, STORAGE_BACKEND
+from metrics import timed, begin_rerun, show_timing_panel
+from inventory_query import show_table_page
+from product_search import pick_product
+from catalog_import import CATALOG_FILE_TYPES, read_catalog, suggest_mapping, map_catalog, dry_run, commit_catalog
+
+main_table = get_table("main")
+begin_rerun()
 st.set_page_config(page_title="Inventory Manager", layout="wide")
 
 def load_inventory():
-    if os.path.exists(INVENTORY_FILE):
-        df = pd.read_excel(INVENTORY_FILE)
+    if main_table.exists():
+        with timed("load"):
+            df = main_table.load_cached()
         return df
     else:
         st.error("Inventory file not found. Please place 'inventory.xlsx' in the app directory.")
         st.stop()
 
-def clean_barcode(val):
-    if pd.isnull(val):
-        return ""
-    s = str(val).strip().replace('\u200b','').replace('\u00A0','')
-    if '.' in s:
-        int_part, dec_part = s.split('.', 1)
-        if dec_part == '0':
-            s = int_part
-    return s
-
-def generate_unique_barcode(df):
-    while True:
-        barcode_val = str(random.randint(1, 11000))
-        if clean_barcode(barcode_val) not in df["BARCODE"].map(clean_barcode).values:
-            return barcode_val
+def generate_unique_barcode():
+    return generate_unique_barcodes(1)[0]
+
+def generate_unique_barcodes(count):
+    return get_allocator(main_table).allocate(count)
 
 def generate_framecode(supplier, df):
-    prefix = supplier[:3].upper()
+    return generate_framecodes(supplier, df, 1)[0]
+
+def generate_framecodes(supplier, df, count):
     frame_col = "FRAME NO."
-    if frame_col not in df.columns:
-        return prefix + "000001"
-    framecodes = df[frame_col].dropna().astype(str)
-    matching = framecodes[framecodes.str.startswith(prefix)]
-    nums = matching.str[len(prefix):].str.extract(r'(\d{6})')[0].dropna()
-    if not nums.empty:
-        max_num = int(nums.max())
-        next_num = max_num + 1
-    else:
-        next_num = 1
-    return f"{prefix}{next_num:06d}"
+    framecodes = df[frame_col] if frame_col in df.columns else ()
+    return reserve_framecodes(framecode_prefix(supplier), count, framecodes)
 
 def generate_barcode_image(code):
     try:
-        CODE128 = barcode.get_barcode_class('code128')
         code = str(code)
         if not code:
             st.error("Barcode value cannot be empty.")
             return None
-        my_code = CODE128(code, writer=ImageWriter())
-        buffer = io.BytesIO()
-        my_code.write(buffer, options={"write_text": False})
-        buffer.seek(0)
-        return buffer
+        with timed("render"):
+            return io.BytesIO(render_barcode(code))
     except Exception as e:
         st.error(f"Error generating barcode image: {e}")
         return None
 
-def get_smart_default(header, df):
-    if header in df.columns and not df[header].dropna().empty:
-        recent = df[header].dropna().iloc[-1]
-        if recent: return str(recent)
-    if header in df.columns and not df[header].dropna().empty:
-        most_common = df[header].dropna().mode()
-        if not most_common.empty: return str(most_common.iloc[0])
+def get_smart_default(header, stats):
+    recent = stats.recent(header)
+    if recent: return str(recent)
+    most_common = stats.mode(header)
+    if most_common is not None: return str(most_common)
     if header == "MANUFACTURER":
         return "Ray-Ban"
     if header == "SUPPLIER":
@@ -157,13 +145,18 @@ if "edit_delete_expanded" not in st.session_state:
     st.session_state["edit_delete_expanded"] = False
 if "pending_delete_index" not in st.session_state:
     st.session_state["pending_delete_index"] = None
+if "pending_delete_base" not in st.session_state:
+    st.session_state["pending_delete_base"] = None
 if "pending_delete_confirmed" not in st.session_state:
     st.session_state["pending_delete_confirmed"] = False
 if "supplier_for_framecode" not in st.session_state:
     st.session_state["supplier_for_framecode"] = ""
 
 df = load_inventory()
-columns = list(df.columns)
+with timed("load"):
+    field_stats = get_field_stats(main_table)
+    key_index = get_key_index(main_table)
+columns = [c for c in df.columns if c not in DERIVED_COLUMNS]
 barcode_col = "BARCODE"
 framecode_col = "FRAME NO."
 
@@ -183,8 +176,21 @@ st.markdown("#### Generate Unique Barcodes")
 btn_col1, btn_col2 = st.columns(2)
 with btn_col1:
     if st.button("Generate Barcode"):
-        st.session_state["barcode"] = generate_unique_barcode(df)
-        st.session_state["add_product_expanded"] = True
+        try:
+            st.session_state["barcode"] = generate_unique_barcode()
+            st.session_state["add_product_expanded"] = True
+        except RuntimeError as e:
+            st.error(str(e))
+    with st.popover("Reserve a batch of barcodes"):
+        batch_size = st.number_input("How many barcodes?", min_value=1, max_value=1000, value=10, key="barcode_batch_size")
+        if st.button("Reserve Batch"):
+            try:
+                st.session_state["barcode_batch"] = generate_unique_barcodes(int(batch_size))
+            except RuntimeError as e:
+                st.error(str(e))
+        if st.session_state.get("barcode_batch"):
+            st.write(f"Reserved {len(st.session_state['barcode_batch'])} barcodes:")
+            st.code("\n".join(st.session_state["barcode_batch"]))
 with btn_col2:
     supplier_val = st.text_input(
         "Enter Supplier for Framecode Generation",
@@ -198,6 +204,16 @@ with btn_col2:
             st.session_state["add_product_expanded"] = True
         else:
             st.warning("Please enter a supplier name first.")
+    with st.popover("Reserve a batch of framecodes"):
+        framecode_batch_size = st.number_input("How many framecodes?", min_value=1, max_value=1000, value=10, key="framecode_batch_size")
+        if st.button("Reserve Framecodes"):
+            if st.session_state["supplier_for_framecode"]:
+                st.session_state["framecode_batch"] = generate_framecodes(st.session_state["supplier_for_framecode"], df, int(framecode_batch_size))
+            else:
+                st.warning("Please enter a supplier name first.")
+        if st.session_state.get("framecode_batch"):
+            st.write(f"Reserved {len(st.session_state['framecode_batch'])} framecodes:")
+            st.code("\n".join(st.session_state["framecode_batch"]))
 
 if st.session_state["barcode"]:
     st.markdown("#### Barcode Image")
@@ -217,7 +233,7 @@ with st.expander("➕ Add a New Product", expanded=st.session_state["add_product
             with cols[idx]:
                 st.markdown('<div class="compact-form">', unsafe_allow_html=True)
                 unique_key = f"textinput_{header}"
-                smart_suggestion = get_smart_default(header, df)
+                smart_suggestion = get_smart_default(header, field_stats)
                 if header == barcode_col:
                     input_values[header] = st.text_input(header, value=st.session_state["barcode"], key=unique_key)
                 elif header == framecode_col:
@@ -272,15 +288,14 @@ with st.expander("➕ Add a New Product", expanded=st.session_state["add_product
         if submit:
             required_fields = [barcode_col, framecode_col]
             missing = [field for field in required_fields if field in visible_headers and not input_values.get(field)]
-            barcode_cleaned = clean_barcode(input_values.get(barcode_col, ""))
-            framecode_cleaned = clean_barcode(input_values.get(framecode_col, ""))
-            df_barcodes_cleaned = df[barcode_col].map(clean_barcode)
-            df_framecodes_cleaned = df[framecode_col].map(clean_barcode)
+            with timed("normalize"):
+                barcode_cleaned = clean_barcode(input_values.get(barcode_col, ""))
+                framecode_cleaned = clean_barcode(input_values.get(framecode_col, ""))
             if missing:
                 st.warning(f"{', '.join(missing)} are required.")
-            elif barcode_cleaned in df_barcodes_cleaned.values:
+            elif key_index.exists(barcode_col, barcode_cleaned):
                 st.error("This barcode already exists in inventory!")
-            elif framecode_cleaned in df_framecodes_cleaned.values:
+            elif key_index.exists(framecode_col, framecode_cleaned):
                 st.error("This framecode already exists in inventory!")
             else:
                 new_row = {}
@@ -294,27 +309,39 @@ with st.expander("➕ Add a New Product", expanded=st.session_state["add_product
                         new_row[col] = ""
                 if "Timestamp" in df.columns:
                     new_row["Timestamp"] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-                df = pd.concat([df, pd.DataFrame([new_row])], ignore_index=True)
-                df.to_excel(INVENTORY_FILE, index=False)
-                st.success(f"Product added successfully!")
-                st.session_state["barcode"] = ""
-                st.session_state["framecode"] = ""
-                st.session_state["add_product_expanded"] = False
-                st.rerun()
+                with timed("persist"), main_table.transaction() as (current, previous):
+                    # Check again under the lock: another session may have added the same code since this page loaded
+                    field_stats.sync(previous, current)
+                    key_index.sync(previous, current)
+                    duplicate = key_index.exists(barcode_col, barcode_cleaned) or key_index.exists(framecode_col, framecode_cleaned)
+                    if not duplicate:
+                        new_id = main_table.insert(new_row)
+                        version = main_table.version()
+                if duplicate:
+                    st.error("This barcode or framecode was just added by someone else!")
+                else:
+                    field_stats.record_insert(previous, version, new_id, new_row)
+                    key_index.record_insert(previous, version, new_id, new_row)
+                    observe_framecode(new_row.get(framecode_col, ""))
+                    st.success(f"Product added successfully!")
+                    st.session_state["barcode"] = ""
+                    st.session_state["framecode"] = ""
+                    st.session_state["add_product_expanded"] = False
+                    st.rerun()
 
 st.markdown('### Current Inventory')
 
 with st.expander("✏️ Edit or 🗑 Delete Products", expanded=st.session_state["edit_delete_expanded"]):
     if len(df) > 0:
-        selected_row = st.selectbox(
-            "Select a product to edit or delete",
-            options=df.index.tolist(),
-            format_func=lambda i: f"{clean_barcode(df.at[i, barcode_col])} - {clean_barcode(df.at[i, framecode_col])}",
-            key="selected_product"
-        )
+        with timed("search"):
+            selected_row = pick_product(main_table, "Select a product to edit or delete", "selected_product")
         if selected_row is not None:
             st.session_state["edit_product_index"] = selected_row
             product = df.loc[selected_row]
+            # The row as this form first showed it; saves merge against it instead of overwriting the row
+            base_key = f"edit_base_{selected_row}"
+            if base_key not in st.session_state:
+                st.session_state[base_key] = product.to_dict()
             edit_values = {}
             n_cols = 3
             visible_headers = [h for h in VISIBLE_FIELDS if h in headers]
@@ -328,7 +355,7 @@ with st.expander("✏️ Edit or 🗑 Delete Products", expanded=st.session_stat
                         value = product[header] if header in product else ""
                         show_value = clean_barcode(value) if header in [barcode_col, framecode_col] else value
                         unique_key = f"edit_textinput_{header}_{selected_row}"
-                        smart_suggestion = get_smart_default(header, df)
+                        smart_suggestion = get_smart_default(header, field_stats)
                         if header == barcode_col or header == framecode_col:
                             edit_values[header] = st.text_input(header, value=str(show_value), key=unique_key)
                         elif header.upper() == "SUPPLIER":
@@ -380,114 +407,235 @@ with st.expander("✏️ Edit or 🗑 Delete Products", expanded=st.session_stat
                 if submit_edit:
                     if "AVAIL FROM" in edit_values and isinstance(edit_values["AVAIL FROM"], (datetime, pd.Timestamp)):
                         edit_values["AVAIL FROM"] = edit_values["AVAIL FROM"].strftime('%Y-%m-%d')
-                    edit_barcode_cleaned = clean_barcode(edit_values[barcode_col])
-                    edit_framecode_cleaned = clean_barcode(edit_values[framecode_col])
-                    df_barcodes_cleaned = df[barcode_col].map(clean_barcode)
-                    df_framecodes_cleaned = df[framecode_col].map(clean_barcode)
-                    duplicate_barcode = (df_barcodes_cleaned == edit_barcode_cleaned) & (df.index != selected_row)
-                    duplicate_framecode = (df_framecodes_cleaned == edit_framecode_cleaned) & (df.index != selected_row)
-                    if duplicate_barcode.any():
+                    with timed("normalize"):
+                        edit_barcode_cleaned = clean_barcode(edit_values[barcode_col])
+                        edit_framecode_cleaned = clean_barcode(edit_values[framecode_col])
+                    if key_index.exists(barcode_col, edit_barcode_cleaned, exclude=selected_row):
                         st.error("Another product with this barcode already exists!")
-                    elif duplicate_framecode.any():
+                    elif key_index.exists(framecode_col, edit_framecode_cleaned, exclude=selected_row):
                         st.error("Another product with this framecode already exists!")
                     else:
+                        updated_row = {}
                         for h in headers:
                             if h in edit_values:
                                 val = edit_values[h]
                                 if h == "AVAIL FROM" and isinstance(val, (datetime, pd.Timestamp)):
                                     val = val.strftime('%Y-%m-%d')
-                                df.at[selected_row, h] = val
-                            else:
-                                df.at[selected_row, h] = ""
+                                updated_row[h] = val
                         if "Timestamp" in df.columns:
-                            df.at[selected_row, "Timestamp"] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-                        df.to_excel(INVENTORY_FILE, index=False)
-                        st.success("Product updated successfully!")
-                        st.session_state["edit_delete_expanded"] = True
-                        st.rerun()
+                            updated_row["Timestamp"] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+                        try:
+                            with timed("persist"), main_table.transaction() as (current, previous):
+                                row_id, changes = main_table.merge_update(selected_row, updated_row, st.session_state[base_key])
+                                old_row = current.loc[row_id]
+                                version = main_table.version()
+                        except RowConflict as e:
+                            st.session_state["edit_conflict"] = (selected_row, str(e))
+                        else:
+                            field_stats.record_update(previous, version, row_id, old_row, changes)
+                            key_index.record_update(previous, version, row_id, old_row, changes)
+                            observe_framecode(updated_row.get(framecode_col, ""))
+                            st.session_state.pop(base_key, None)
+                            st.session_state.pop("edit_conflict", None)
+                            st.success("Product updated successfully!")
+                            st.session_state["edit_delete_expanded"] = True
+                            st.rerun()
                 if submit_delete:
                     st.session_state["pending_delete_index"] = selected_row
+                    # The row as seen now: shown in the confirmation and checked against when deleting
+                    st.session_state["pending_delete_base"] = st.session_state.get(base_key) or df.loc[selected_row].to_dict()
+            conflict = st.session_state.get("edit_conflict")
+            if conflict and conflict[0] == selected_row:
+                st.error(f"{conflict[1]} Nothing was saved.")
+                if st.button("Reload product", key="edit_conflict_reload"):
+                    # Start over from the stored row: drop the stale base and this form's widget values
+                    st.session_state.pop(base_key, None)
+                    st.session_state.pop("edit_conflict", None)
+                    for header in visible_headers:
+                        st.session_state.pop(f"edit_textinput_{header}_{selected_row}", None)
+                    st.rerun()
 
     else:
         st.info("No products in inventory yet.")
 
 if st.session_state.get("pending_delete_index") is not None:
-    st.warning(f"Are you sure you want to delete product with barcode '{clean_barcode(df.at[st.session_state['pending_delete_index'], barcode_col])}' and framecode '{clean_barcode(df.at[st.session_state['pending_delete_index'], framecode_col])}'?")
+    # Row ids can move between reruns (positional backends), so show the saved row rather than re-indexing df
+    pending_base = st.session_state["pending_delete_base"]
+    st.warning(f"Are you sure you want to delete product with barcode '{clean_barcode(pending_base.get(barcode_col))}' and framecode '{clean_barcode(pending_base.get(framecode_col))}'?")
     confirm_col, cancel_col = st.columns(2)
     with confirm_col:
         if st.button("Confirm Delete", key="confirm_delete_btn"):
-            df = df.drop(st.session_state["pending_delete_index"]).reset_index(drop=True)
-            df.to_excel(INVENTORY_FILE, index=False)
-            st.success("Product deleted successfully!")
-            st.session_state["edit_product_index"] = None
-            st.session_state["edit_delete_expanded"] = True
-            st.session_state["pending_delete_index"] = None
-            st.rerun()
+            delete_index = st.session_state["pending_delete_index"]
+            base = pending_base
+            try:
+                with timed("persist"), main_table.transaction() as (current, previous):
+                    delete_index = main_table.checked_delete(delete_index, base)
+                    old_row = current.loc[delete_index]
+                    version = main_table.version()
+            except RowConflict as e:
+                st.error(f"{e} Nothing was deleted; review the product and try again.")
+                st.session_state.pop(f"edit_base_{st.session_state['pending_delete_index']}", None)
+                st.session_state["pending_delete_index"] = None
+                st.session_state["pending_delete_base"] = None
+            else:
+                field_stats.record_delete(previous, version, delete_index, old_row)
+                key_index.record_delete(previous, version, delete_index, old_row)
+                st.session_state.pop(f"edit_base_{st.session_state['pending_delete_index']}", None)
+                st.success("Product deleted successfully!")
+                st.session_state["edit_product_index"] = None
+                st.session_state["edit_delete_expanded"] = True
+                st.session_state["pending_delete_index"] = None
+                st.session_state["pending_delete_base"] = None
+                st.rerun()
     with cancel_col:
         if st.button("Cancel", key="cancel_delete_btn"):
             st.session_state["pending_delete_index"] = None
-
-st.dataframe(df, use_container_width=True)
+            st.session_state["pending_delete_base"] = None
+
+show_table_page(main_table, "inventory_table")
+
+with st.expander("💾 Import / Export Inventory"):
+    st.write(f"Storage backend: **{STORAGE_BACKEND}**. Excel workbooks are used to move the inventory in and out.")
+    if st.button("Prepare Excel Export"):
+        export_buffer = io.BytesIO()
+        main_table.export_excel(export_buffer)
+        st.session_state["inventory_export"] = export_buffer.getvalue()
+    if st.session_state.get("inventory_export"):
+        st.download_button(
+            label="Download Inventory as Excel",
+            data=st.session_state["inventory_export"],
+            file_name="inventory.xlsx",
+            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+        )
+    import_file = st.file_uploader("Import inventory from Excel (replaces current inventory)", type=["xlsx"], key="import_inventory_file")
+    if import_file is not None and st.button("Replace Inventory with Uploaded File"):
+        try:
+            main_table.import_excel(import_file)
+            reset_framecode_counters()
+            st.success("Inventory imported successfully!")
+            st.rerun()
+        except Exception as e:
+            st.error(f"Error importing file: {e}")
+
+with st.expander("📥 Import Supplier Catalog"):
+    st.write("Add a supplier's range in one go. Blank barcodes and framecodes are generated (framecodes from SUPPLIER).")
+    if st.session_state.get("catalog_imported"):
+        st.success(f"Imported {st.session_state.pop('catalog_imported')} products.")
+    # A fresh uploader key per import, so the imported file is not checked again against itself
+    catalog_file = st.file_uploader(
+        "Supplier catalog", type=CATALOG_FILE_TYPES, key=f"catalog_file_{st.session_state.get('catalog_uploads', 0)}"
+    )
+    if catalog_file is not None:
+        try:
+            raw_catalog = read_catalog(catalog_file, catalog_file.name)
+        except Exception as e:
+            st.error(f"Error reading file: {e}")
+            raw_catalog = None
+        if raw_catalog is not None:
+            catalog_fields = [h for h in VISIBLE_FIELDS if h in headers]
+            suggested = suggest_mapping(raw_catalog.columns, catalog_fields)
+            st.write("Map the supplier's columns onto inventory fields:")
+            mapping = {}
+            map_cols = st.columns(3, gap="small")
+            for i, column in enumerate(raw_catalog.columns):
+                choices = ["(ignore)"] + catalog_fields
+                default = choices.index(suggested[column]) if suggested[column] else 0
+                chosen = map_cols[i % 3].selectbox(str(column), choices, index=default, key=f"catalog_map_{catalog_file.file_id}_{i}")
+                mapping[column] = None if chosen == "(ignore)" else chosen
+            targets = [f for f in mapping.values() if f]
+            repeated = sorted({f for f in targets if targets.count(f) > 1})
+            catalog_enums = {"F TYPE": F_TYPE_OPTIONS, "FRSTATUS": FRSTATUS_OPTIONS, "TAXPC": TAXPC_OPTIONS}
+            if repeated:
+                st.error(f"Each field can only be mapped once: {', '.join(repeated)}")
+            else:
+                with timed("validate"):
+                    batch = map_catalog(raw_catalog, mapping)
+                    issues, summary = dry_run(batch, df, catalog_enums)
+                st.write("Dry run: " + " · ".join(f"{name}: {count}" for name, count in summary.items()))
+                if len(issues):
+                    st.error(f"{summary['rows with problems']} rows need fixing before the catalog can be imported.")
+                    st.dataframe(issues, use_container_width=True)
+                    st.download_button(
+                        label="Download problems (CSV)",
+                        data=issues.to_csv(index=False).encode("utf-8"),
+                        file_name="catalog_problems.csv",
+                        mime="text/csv",
+                    )
+                elif summary["rows"] and st.button(f"Import {summary['rows']} products", key="catalog_import_btn"):
+                    with timed("persist"):
+                        row_ids, issues = commit_catalog(batch, main_table, catalog_enums)
+                    if len(issues):
+                        st.error("The inventory changed while importing; check the catalog again.")
+                        st.dataframe(issues, use_container_width=True)
+                    else:
+                        st.session_state["catalog_imported"] = len(row_ids)
+                        st.session_state["catalog_uploads"] = st.session_state.get("catalog_uploads", 0) + 1
+                        st.rerun()
 
 with st.expander("📦 Stock Count"):
     st.write("Upload a file (CSV, Excel, or TXT) of scanned barcodes from your stock count.")
-    uploaded_file = st.file_uploader("Upload scanned barcodes", type=["csv", "xlsx", "txt"])
+    uploaded_file = st.file_uploader("Upload scanned barcodes", type=SCAN_FILE_TYPES)
     if uploaded_file is not None:
         try:
-            if uploaded_file.name.endswith(".csv"):
-                scanned_df = pd.read_csv(uploaded_file)
-            elif uploaded_file.name.endswith(".xlsx"):
-                scanned_df = pd.read_excel(uploaded_file)
-            elif uploaded_file.name.endswith(".txt"):
-                scanned_df = pd.read_csv(uploaded_file, delimiter=None)
-            else:
-                st.error("Unsupported file type.")
-                scanned_df = None
+            scanned_preview = preview_scan_file(uploaded_file, uploaded_file.name)
         except Exception as e:
             st.error(f"Error reading file: {e}")
-            scanned_df = None
+            scanned_preview = None
 
-        if scanned_df is not None:
+        if scanned_preview is not None:
             st.write("Preview of your uploaded file:")
-            st.dataframe(scanned_df.head(), use_container_width=True)
+            st.dataframe(scanned_preview, use_container_width=True)
             barcode_candidates = [
-                col for col in scanned_df.columns
+                col for col in scanned_preview.columns
                 if "barcode" in col.lower() or "ean" in col.lower() or "upc" in col.lower() or "code" in col.lower()
             ]
             if not barcode_candidates:
-                barcode_candidates = scanned_df.columns.tolist()  # fallback to all columns
+                barcode_candidates = scanned_preview.columns.tolist()  # fallback to all columns
 
             barcode_column = st.selectbox(
                 "Select the column containing barcodes", barcode_candidates
             )
 
-            inventory_barcodes = set(df[barcode_col].map(clean_barcode))
-            scanned_barcodes = set(scanned_df[barcode_column].map(clean_barcode))
-            matched = inventory_barcodes & scanned_barcodes
-            missing = inventory_barcodes - scanned_barcodes
-            unexpected = scanned_barcodes - inventory_barcodes
-            st.success(f"Matched items: {len(matched)}")
-            st.warning(f"Missing items: {len(missing)}")
-            st.error(f"Unexpected items: {len(unexpected)}")
-            if matched:
-                st.write("✅ Present items:")
-                st.dataframe(df[df[barcode_col].map(clean_barcode).isin(matched)])
-            if missing:
-                st.write("❌ Missing items:")
-                st.dataframe(df[df[barcode_col].map(clean_barcode).isin(missing)])
-            if unexpected:
-                st.write("⚠️ Unexpected items (not in system):")
-                st.write(list(unexpected))
+            try:
+                with timed("reconcile"):
+                    report, blank_scans = reconcile_scan_file(df, uploaded_file, uploaded_file.name, barcode_column)
+            except Exception as e:
+                st.error(f"Error reading file: {e}")
+                report = None
+            if report is not None:
+                statuses = report["STATUS"]
+                st.success(f"Matched items: {int((statuses == 'matched').sum())}")
+                st.warning(f"Over: {int((statuses == 'over').sum())} · Short: {int((statuses == 'short').sum())}")
+                st.error(f"Unexpected items: {int((statuses == 'unexpected').sum())}")
+                if blank_scans:
+                    st.info(f"{blank_scans} blank scans were skipped.")
+                st.write("Variance summary (value at RRP and cost price):")
+                st.dataframe(summarize(report), use_container_width=True)
+                detail_columns = [c for c in ["FRAME NO.", "MANUFACTURER", "MODEL", "F COLOUR", "SIZE"] if c in df.columns]
+                details = df[df["BARCODE_CLEAN"] != ""].drop_duplicates("BARCODE_CLEAN").set_index("BARCODE_CLEAN")[detail_columns]
+                for status, heading in [("short", "❌ Short items:"), ("over", "➕ Over-counted items:"), ("unexpected", "⚠️ Unexpected items (not in system):")]:
+                    rows = report[statuses == status]
+                    if not rows.empty:
+                        st.write(heading)
+                        st.dataframe(rows.join(details), use_container_width=True)
+                st.download_button(
+                    label="Download Variance Report (CSV)",
+                    data=report.join(details).to_csv().encode("utf-8"),
+                    file_name="stock_count_variance.csv",
+                    mime="text/csv",
+                )
 
 with st.expander("🔍 Quick Stock Check (Scan Barcode)"):
     st.write("Place your cursor below, scan a barcode, and instantly see product details!")
     scanned_barcode = st.text_input("Scan Barcode", value="", key="stock_check_barcode_input")
     if scanned_barcode:
-        cleaned_input = clean_barcode(scanned_barcode)
-        matches = df[df[barcode_col].map(clean_barcode) == cleaned_input]
+        with timed("normalize"):
+            cleaned_input = clean_barcode(scanned_barcode)
+        with timed("lookup"):
+            matches = df[df["BARCODE_CLEAN"] == cleaned_input]
         if not matches.empty:
             st.success("Product found:")
-            st.dataframe(matches)
+            st.dataframe(strip_derived_columns(matches))
             product = matches.iloc[0]
 
             barcode_value = product[barcode_col]
@@ -521,3 +669,5 @@ with st.expander("🔍 Quick Stock Check (Scan Barcode)"):
             st.markdown('</div></div>', unsafe_allow_html=True)
         else:
             st.error("Barcode not found in inventory.")
+
+show_timing_panel()
@@ -0,0 +1,121 @@
+import os
+import re
+import threading
+import pandas as pd
+
+# In-house barcode space. The defaults match the original random.randint(1, 11000) codes;
+# set BARCODE_CHECK_DIGIT=ean13 or upca to hand out check-digit codes that can never collide
+# with supplier-printed ones. Those codes always sit in a GS1 restricted-circulation range
+# ("2" unless BARCODE_PREFIX picks another).
+BARCODE_RANGE_START = int(os.environ.get("BARCODE_RANGE_START", "1"))
+BARCODE_RANGE_END = int(os.environ.get("BARCODE_RANGE_END", "11000"))
+BARCODE_PREFIX = os.environ.get("BARCODE_PREFIX", "")
+BARCODE_CHECK_DIGIT = os.environ.get("BARCODE_CHECK_DIGIT") or None
+
+CHECK_DIGIT_LENGTHS = {"ean13": 13, "upca": 12}
+# GS1 restricted-circulation (in-store) prefixes, as the leading digits of the EAN-13 form
+RESTRICTED_PREFIXES = ("02", "04", "2")
+DEFAULT_RESTRICTED_PREFIX = "2"
+
+def gs1_check_digit(body):
+    total = sum(int(d) * (3 if i % 2 == 0 else 1) for i, d in enumerate(reversed(body)))
+    return str((10 - total % 10) % 10)
+
+class BarcodeAllocator:
+    """Hands out unused codes from a numeric range: a used-number set plus a forward cursor.
+
+    Each call is O(1) amortized because the cursor never revisits a number until the
+    range wraps, and a full range is detected from the set size instead of looping.
+    """
+
+    def __init__(self, start=BARCODE_RANGE_START, end=BARCODE_RANGE_END, prefix=BARCODE_PREFIX,
+                 check_digit=BARCODE_CHECK_DIGIT, width=None):
+        if check_digit is not None and check_digit not in CHECK_DIGIT_LENGTHS:
+            raise ValueError(f"Unknown check digit scheme '{check_digit}'. Choose from: {', '.join(CHECK_DIGIT_LENGTHS)}")
+        if check_digit is not None:
+            prefix = prefix or DEFAULT_RESTRICTED_PREFIX
+            if not prefix.isdigit():
+                raise ValueError("Check-digit barcodes need a numeric prefix.")
+            # A UPC-A code is an EAN-13 code with a leading 0
+            ean_prefix = prefix if check_digit == "ean13" else "0" + prefix
+            if not ean_prefix.startswith(RESTRICTED_PREFIXES):
+                raise ValueError(
+                    f"Prefix '{prefix}' is outside the GS1 restricted-circulation ranges (02, 04, 20-29), "
+                    f"so its {check_digit} codes could collide with supplier barcodes."
+                )
+            width = CHECK_DIGIT_LENGTHS[check_digit] - 1 - len(prefix)
+            if width < 1 or end >= 10 ** width:
+                raise ValueError(f"Range end {end} does not fit a {check_digit} code with prefix '{prefix}'.")
+        if start > end:
+            raise ValueError("Barcode range start must not be greater than its end.")
+        self.start = start
+        self.end = end
+        self.prefix = prefix
+        self.check_digit = check_digit
+        self.width = width
+        self._used = set()
+        self._cursor = start
+        self._lock = threading.Lock()
+        self._version = None
+        number = r"\d{%d}" % width if width else r"0|[1-9]\d*"
+        self._pattern = re.escape(prefix) + f"({number})" + (r"\d" if check_digit else "")
+
+    def format(self, number):
+        digits = f"{number:0{self.width}d}" if self.width else str(number)
+        body = self.prefix + digits
+        if self.check_digit:
+            body += gs1_check_digit(body)
+        return body
+
+    def mark_used(self, codes):
+        """Reserve every code in `codes` (normalized strings) that falls inside this allocator's range."""
+        codes = pd.Series(codes, dtype=object).dropna().astype(str)
+        numbers = codes[codes.str.fullmatch(self._pattern)].str.extract(self._pattern, expand=False)
+        numbers = pd.to_numeric(numbers[numbers.str.lstrip("0").str.len() <= len(str(self.end))]).astype("int64")
+        numbers = numbers[(numbers >= self.start) & (numbers <= self.end)]
+        with self._lock:
+            self._used.update(numbers.tolist())
+
+    def sync(self, version, codes):
+        """Mark the codes of a new inventory version as used; no-op when the version is unchanged."""
+        if self._version == version:
+            return
+        self.mark_used(codes)
+        self._version = version
+
+    def free_count(self):
+        return (self.end - self.start + 1) - len(self._used)
+
+    def allocate(self, count=1):
+        with self._lock:
+            if count > self.free_count():
+                raise RuntimeError(
+                    f"Only {self.free_count()} unused barcodes left in {self.format(self.start)}-{self.format(self.end)}."
+                )
+            numbers = []
+            while len(numbers) < count:
+                if self._cursor > self.end:
+                    self._cursor = self.start
+                if self._cursor not in self._used:
+                    self._used.add(self._cursor)
+                    numbers.append(self._cursor)
+                self._cursor += 1
+            return [self.format(n) for n in numbers]
+
+_allocators = {}
+_allocators_lock = threading.Lock()
+
+def get_allocator(table, start=BARCODE_RANGE_START, end=BARCODE_RANGE_END, prefix=BARCODE_PREFIX,
+                  check_digit=BARCODE_CHECK_DIGIT):
+    """Process-wide allocator for `table`, kept in step with its current inventory version.
+
+    Codes handed out but not yet saved stay reserved, so two sessions never get the same one.
+    """
+    key = (table.name, start, end, prefix, check_digit)
+    with _allocators_lock:
+        if key not in _allocators:
+            _allocators[key] = BarcodeAllocator(start, end, prefix, check_digit)
+        allocator = _allocators[key]
+    df = table.load_cached()
+    allocator.sync(table.version(), df["BARCODE_CLEAN"] if "BARCODE_CLEAN" in df.columns else [])
+    return allocator
@@ -0,0 +1,64 @@
+import io
+import os
+import hashlib
+import tempfile
+from functools import lru_cache
+import barcode
+from barcode.writer import ImageWriter, SVGWriter
+
+# Rendered barcodes are kept in a bounded in-memory LRU; set BARCODE_IMAGE_CACHE_DIR to also
+# keep them on disk (content-addressed) so they survive restarts and are shared between processes.
+BARCODE_IMAGE_CACHE_SIZE = int(os.environ.get("BARCODE_IMAGE_CACHE_SIZE", "1024"))
+BARCODE_IMAGE_CACHE_DIR = os.environ.get("BARCODE_IMAGE_CACHE_DIR") or None
+
+WRITERS = {"png": ImageWriter, "svg": SVGWriter}
+MIME_TYPES = {"png": "image/png", "svg": "image/svg+xml"}
+DEFAULT_OPTIONS = {"write_text": False}
+
+def _disk_path(key, fmt):
+    digest = hashlib.sha256(repr(key).encode("utf-8")).hexdigest()
+    return os.path.join(BARCODE_IMAGE_CACHE_DIR, digest[:2], f"{digest}.{fmt}")
+
+def _read_disk(path):
+    try:
+        with open(path, "rb") as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+def _write_disk(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    with os.fdopen(fd, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+def _encode(symbology, code, fmt, options):
+    barcode_class = barcode.get_barcode_class(symbology)
+    buffer = io.BytesIO()
+    barcode_class(code, writer=WRITERS[fmt]()).write(buffer, options=options)
+    return buffer.getvalue()
+
+@lru_cache(maxsize=BARCODE_IMAGE_CACHE_SIZE)
+def _render_cached(symbology, code, fmt, option_items):
+    key = (symbology, code, fmt, option_items)
+    path = _disk_path(key, fmt) if BARCODE_IMAGE_CACHE_DIR else None
+    if path:
+        data = _read_disk(path)
+        if data is not None:
+            return data
+    data = _encode(symbology, code, fmt, dict(option_items))
+    if path:
+        _write_disk(path, data)
+    return data
+
+def render_barcode(code, symbology="code128", fmt="png", options=None):
+    """Encoded barcode image bytes; repeat renders of the same (symbology, code, options) are cache hits."""
+    if fmt not in WRITERS:
+        raise ValueError(f"Unknown barcode image format '{fmt}'. Choose from: {', '.join(WRITERS)}")
+    merged = dict(DEFAULT_OPTIONS)
+    merged.update(options or {})
+    return _render_cached(symbology, str(code), fmt, tuple(sorted(merged.items())))
+
+def clear_barcode_cache():
+    _render_cached.cache_clear()
@@ -1,10 +1,36 @@
 from flask import Flask, render_template, request, jsonify, redirect, url_for
 import openpyxl
 import os
+import json
+import time
+import signal
+import socket
+import shutil
+import tempfile
+import hashlib
+import argparse
+import threading
+from barcode_utils import clean_barcode, clean_barcode_series
+from inventory_storage import get_table, APP_DIR, DERIVED_COLUMNS, BARCODE_COLUMN
+from change_notify import get_watcher
+from index_snapshot import SnapshotReader, write_snapshot, read_snapshot_version
+from metrics import timed, inc, observe, collect, get_registry, render_prometheus, share_metrics, start_metrics_flusher
 
 app = Flask(__name__)
 
 EXCEL_PATH = 'inventory.xlsx'
+main_table = get_table("main")
+
+# Scanners sync offline buffers in bursts; cap one request so it cannot hold the server
+LOOKUP_BATCH_MAX = 5000
+PRODUCTS_PAGE_DEFAULT = 100
+PRODUCTS_PAGE_MAX = 1000
+
+# Multi-worker mode: the parent publishes a memory-mapped barcode index here and every worker
+# answers lookups from it, so the inventory is never parsed per worker
+INDEX_SNAPSHOT_PATH = os.environ.get("BARCODE_INDEX_SNAPSHOT") or os.path.join(APP_DIR, "barcode_index.snapshot")
+INDEX_PUBLISH_INTERVAL = float(os.environ.get("BARCODE_INDEX_PUBLISH_INTERVAL", "2"))
+_snapshot_reader = None
 
 def get_inventory_headers(excel_path=EXCEL_PATH):
     if not os.path.exists(excel_path):
@@ -14,26 +40,135 @@ def get_inventory_headers(excel_path=EXCEL_PATH):
         ws.append(default_headers)
         wb.save(excel_path)
         return default_headers
-    wb = openpyxl.load_workbook(excel_path)
-    ws = wb.active
-    headers = [cell.value for cell in next(ws.iter_rows(max_row=1))]
-    return headers
-
-def find_product_by_barcode(barcode, excel_path=EXCEL_PATH):
-    wb = openpyxl.load_workbook(excel_path)
-    ws = wb.active
-    headers = [cell.value for cell in next(ws.iter_rows(max_row=1))]
-    barcode_column = None
-    for idx, header in enumerate(headers):
-        if str(header).lower() == "barcode":
-            barcode_column = idx
-            break
-    if barcode_column is None:
+    # Read-only mode streams the sheet, so only the first row is parsed
+    wb = openpyxl.load_workbook(excel_path, read_only=True)
+    try:
+        return list(next(wb.active.iter_rows(max_row=1, values_only=True), ()))
+    finally:
+        wb.close()
+
+# Resident barcode -> row index, rebuilt only when the inventory store changes
+_barcode_index = {"key": None, "data": (None, {})}
+_barcode_index_lock = threading.Lock()
+
+def build_barcode_index(df):
+    if "BARCODE_CLEAN" not in df.columns:
+        return {}
+    keys = df["BARCODE_CLEAN"]
+    keys = keys[keys != ""].drop_duplicates(keep="first")
+    return dict(zip(keys.values, keys.index))
+
+def get_barcode_index(table=main_table):
+    key = (table.name, table.version())
+    if _barcode_index["key"] != key:
+        with _barcode_index_lock:
+            if _barcode_index["key"] != key:
+                with timed("load"):
+                    df = table.load_cached()
+                    _barcode_index["data"] = (df, build_barcode_index(df))
+                _barcode_index["key"] = key
+    return _barcode_index["data"]
+
+def frame_to_records(frame):
+    """Rows as the scanner API has always sent them: text values (None when blank), BARCODE normalized.
+
+    The frame's dtypes are pandas' guesses (a BARCODE column with gaps reads as float), so they are
+    not passed on to clients.
+    """
+    frame = frame[[c for c in frame.columns if c not in DERIVED_COLUMNS]]
+    text = frame.astype(str)
+    if BARCODE_COLUMN in frame.columns:
+        text[BARCODE_COLUMN] = clean_barcode_series(frame[BARCODE_COLUMN]).to_numpy()
+    return text.astype(object).where(frame.notna().to_numpy(), None).to_dict("records")
+
+def row_to_record(row):
+    return frame_to_records(row.to_frame().T)[0]
+
+def find_product_by_barcode(barcode, table=main_table):
+    with timed("normalize"):
+        key = clean_barcode(barcode)
+    if not key:
         return None
-    for row in ws.iter_rows(min_row=2, values_only=True):
-        if str(row[barcode_column]).strip() == str(barcode).strip():
-            return dict(zip(headers, row))
-    return None
+    if _snapshot_reader is not None:
+        with timed("lookup"):
+            product = _snapshot_reader.current().get(key)
+    else:
+        df, index = get_barcode_index(table)
+        with timed("lookup"):
+            row_id = index.get(key)
+            product = None if row_id is None else row_to_record(df.loc[row_id])
+    inc("barcode_lookups_total", result="hit" if product else "miss")
+    return product
+
+def inventory_etag(table=main_table, *extra):
+    """Weak validator for responses derived from the current inventory version (plus any request inputs)."""
+    # Workers answer from the published snapshot, which can lag the store: tag the version they serve
+    version = _snapshot_reader.current().version if _snapshot_reader is not None else table.version()
+    digest = hashlib.sha1(repr((table.name, version) + extra).encode("utf-8")).hexdigest()[:20]
+    return f'W/"{digest}"'
+
+def conditional_json(etag, build):
+    """304 when the client already holds `etag`; otherwise `build()` as JSON carrying the ETag."""
+    if etag in request.headers.get("If-None-Match", ""):
+        response = app.response_class(status=304)
+    else:
+        response = jsonify(build())
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = "no-cache"
+    return response
+
+def inventory_columns(table=main_table):
+    if _snapshot_reader is not None:
+        return _snapshot_reader.current().columns
+    df, _ = get_barcode_index(table)
+    return [c for c in df.columns if c not in DERIVED_COLUMNS]
+
+def lookup_records(keys, columns, table=main_table):
+    """Normalized barcode -> projected record, for each of `keys` found in the inventory."""
+    keys = list(dict.fromkeys(keys))
+    if _snapshot_reader is not None:
+        snapshot = _snapshot_reader.current()
+        records = {}
+        for key in keys:
+            record = snapshot.get(key)
+            if record is not None:
+                records[key] = {c: record.get(c) for c in columns}
+        return records
+    df, index = get_barcode_index(table)
+    found = [k for k in keys if k in index]
+    if not found:
+        return {}
+    return dict(zip(found, frame_to_records(df.loc[[index[k] for k in found], columns])))
+
+def parse_fields(fields, columns):
+    """Requested projection as a column list (all stored columns when not given)."""
+    if not fields:
+        return columns
+    if isinstance(fields, str):
+        fields = fields.split(",")
+    fields = [str(f).strip() for f in fields if str(f).strip()]
+    unknown = [f for f in fields if f not in columns]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    return fields
+
+@app.before_request
+def start_request_timer():
+    request.environ["barcode.started"] = time.perf_counter()
+
+@app.after_request
+def record_request(response):
+    started = request.environ.get("barcode.started")
+    endpoint = request.endpoint or "unknown"
+    if started is not None:
+        observe("barcode_http_request_seconds", time.perf_counter() - started, endpoint=endpoint)
+    inc("barcode_http_requests_total", endpoint=endpoint, status=response.status_code)
+    return response
+
+@app.route('/metrics')
+def metrics():
+    # In multi-worker mode this sums every worker's metrics, whichever worker answers
+    return app.response_class(render_prometheus(collect()), mimetype="text/plain; version=0.0.4")
 
 @app.route('/scan')
 def scan():
@@ -49,6 +184,79 @@ def save_barcode():
     else:
         return jsonify({"error": "Barcode not found in inventory."})
 
+@app.route('/lookup_batch', methods=['POST'])
+def lookup_batch():
+    data = request.get_json(silent=True) or {}
+    barcodes = data.get('barcodes')
+    if not isinstance(barcodes, list):
+        return jsonify({"error": "Send a JSON body with a 'barcodes' list."}), 400
+    if len(barcodes) > LOOKUP_BATCH_MAX:
+        return jsonify({"error": f"At most {LOOKUP_BATCH_MAX} barcodes per request."}), 413
+    try:
+        columns = parse_fields(data.get('fields'), inventory_columns())
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    def build():
+        with timed("normalize"):
+            keys = [clean_barcode(b) for b in barcodes]
+        with timed("lookup"):
+            records = lookup_records(keys, columns)
+        inc("barcode_lookups_total", len(records), result="hit")
+        inc("barcode_lookups_total", len(keys) - len(records), result="miss")
+        results = []
+        for barcode, key in zip(barcodes, keys):
+            if key in records:
+                results.append({"barcode": barcode, "fields": records[key]})
+            else:
+                results.append({"barcode": barcode, "error": "Barcode not found in inventory."})
+        found_count = sum(1 for r in results if "fields" in r)
+        return {"results": results, "found": found_count, "missing": len(results) - found_count}
+
+    request_key = hashlib.sha1(json.dumps([barcodes, columns], default=str).encode("utf-8")).hexdigest()
+    return conditional_json(inventory_etag(main_table, request_key), build)
+
+@app.route('/products', methods=['GET'])
+def products():
+    try:
+        columns = parse_fields(request.args.get('fields'), inventory_columns())
+        limit = int(request.args.get('limit', PRODUCTS_PAGE_DEFAULT))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    limit = max(1, min(limit, PRODUCTS_PAGE_MAX))
+    # A cursor is "<next position>-<inventory version tag>", so paging across a change is refused
+    # instead of silently skipping or repeating rows
+    version_tag = inventory_etag(main_table)[3:11]
+    start = 0
+    cursor = request.args.get('cursor')
+    if cursor:
+        position, _, tag = cursor.partition("-")
+        if not position.isdigit():
+            return jsonify({"error": "Invalid cursor."}), 400
+        if tag != version_tag:
+            return jsonify({"error": "Inventory changed since this cursor was issued; start again without a cursor."}), 409
+        start = int(position)
+
+    def build():
+        with timed("lookup"):
+            if _snapshot_reader is not None:
+                # Pages come from the shared snapshot, so workers never parse the inventory
+                snapshot = _snapshot_reader.current()
+                total = snapshot.rows
+                items = [{c: record.get(c) for c in columns} for record in snapshot.page(start, start + limit)]
+            else:
+                df, _ = get_barcode_index()
+                total = len(df)
+                items = frame_to_records(df.iloc[start:start + limit][columns])
+        end = start + len(items)
+        return {
+            "items": items,
+            "total": total,
+            "next_cursor": f"{end}-{version_tag}" if end < total else None,
+        }
+
+    return conditional_json(inventory_etag(main_table, tuple(columns), start, limit), build)
+
 # Updated route: Guide the user to use the Streamlit app for adding products
 @app.route('/add_product_page', methods=['GET'])
 def add_product_page():
@@ -64,5 +272,99 @@ def add_product_page():
     <p>Or run <code>streamlit run add_product.py</code> in your terminal.</p>
     """
 
+def publish_index_snapshot(table=main_table, path=INDEX_SNAPSHOT_PATH):
+    """Write the current barcode index as a shared snapshot; returns the inventory tag it holds."""
+    tag = inventory_etag(table)
+    df, index = get_barcode_index(table)
+    with timed("publish"):
+        columns = [c for c in df.columns if c not in DERIVED_COLUMNS]
+        records = frame_to_records(df[columns])
+        key_rows = df.index.get_indexer(list(index.values())).tolist()
+        # Same encoder as jsonify, so both serving modes format dates and numbers alike
+        write_snapshot(path, list(index), key_rows, records, columns, tag, dumps=app.json.dumps)
+    return tag
+
+def publish_snapshots_forever(table=main_table, path=INDEX_SNAPSHOT_PATH, interval=INDEX_PUBLISH_INTERVAL):
+    published = read_snapshot_version(path)
+    watcher = get_watcher()
+    generation = watcher.generation if watcher is not None else None
+    while True:
+        if inventory_etag(table) != published:
+            try:
+                published = publish_index_snapshot(table, path)
+            except Exception as e:
+                # Usually a workbook caught mid-save; workers keep the previous snapshot until the next try
+                app.logger.warning("Could not publish barcode index snapshot: %s", e)
+        # Wake as soon as the inventory changes; the timeout retries a failed publish
+        if watcher is not None:
+            generation = watcher.wait(generation, interval)
+        else:
+            time.sleep(interval)
+
+def _raise_interrupt(signum, frame):
+    raise KeyboardInterrupt
+
+def _exit_with_parent(parent, interval=1.0):
+    # A worker whose parent died (even by SIGKILL) would keep serving a snapshot nobody republishes
+    while os.getppid() == parent:
+        time.sleep(interval)
+    os._exit(0)
+
+def serve(host="127.0.0.1", port=5001, workers=1, snapshot_path=INDEX_SNAPSHOT_PATH):
+    """Pre-forked workers sharing one listening socket and one memory-mapped index snapshot."""
+    global _snapshot_reader
+    from werkzeug.serving import make_server
+    if workers <= 1 or not hasattr(os, "fork"):
+        app.run(host=host, port=port, threaded=True)
+        return
+    publish_index_snapshot(main_table, snapshot_path)
+    metrics_dir = tempfile.mkdtemp(prefix="barcode-metrics-")
+    share_metrics(metrics_dir)
+    listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    listener.bind((host, port))
+    listener.listen(128)
+    children = []
+    parent = os.getpid()
+    for _ in range(workers):
+        pid = os.fork()
+        if pid == 0:
+            try:
+                _snapshot_reader = SnapshotReader(snapshot_path)
+                threading.Thread(target=_exit_with_parent, args=(parent,), name="parent-watch", daemon=True).start()
+                get_registry().clear()  # the parent's own timings are reported by the parent
+                start_metrics_flusher()
+                make_server(host, port, app, threaded=True, fd=listener.fileno()).serve_forever()
+            finally:
+                os._exit(0)
+        children.append(pid)
+    print(f"Serving on http://{host}:{port} with {workers} workers (index snapshot {snapshot_path})")
+    start_metrics_flusher()
+    # A kill or service stop takes the same way out as Ctrl+C, so the workers and metrics dir go too
+    signal.signal(signal.SIGTERM, _raise_interrupt)
+    try:
+        publish_snapshots_forever(main_table, snapshot_path)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        signal.signal(signal.SIGTERM, signal.SIG_IGN)
+        for pid in children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        for pid in children:
+            os.waitpid(pid, 0)
+        shutil.rmtree(metrics_dir, ignore_errors=True)
+
 if __name__ == '__main__':
-    app.run(port=5001)
\ No newline at end of file
+    # HTTP/1.1 keeps scanner connections alive between burst requests
+    from werkzeug.serving import WSGIRequestHandler
+    WSGIRequestHandler.protocol_version = "HTTP/1.1"
+    parser = argparse.ArgumentParser(description="Barcode lookup server.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5001)
+    parser.add_argument("--workers", type=int, default=1, help="worker processes (more than 1 serves from the shared index snapshot)")
+    args = parser.parse_args()
+    serve(args.host, args.port, args.workers)
\ No newline at end of file
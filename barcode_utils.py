@@ -0,0 +1,73 @@
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+except ImportError:  # optional: only speeds up integer formatting
+    pa = None
+
+# str(float) switches to exponent notation at 1e16, so only smaller whole floats print as "<int>.0"
+_WHOLE_FLOAT_LIMIT = 1e16
+
+def clean_barcode(val):
+    if pd.isnull(val):
+        return ""
+    s = str(val).strip().replace('\u200b','').replace('\u00A0','')
+    if '.' in s:
+        int_part, dec_part = s.split('.', 1)
+        if dec_part == '0':
+            s = int_part
+    return s
+
+def _int_strings(ints):
+    if pa is not None:
+        return pc.cast(pa.array(ints), pa.string()).to_numpy(zero_copy_only=False)
+    return np.array(ints.astype(str).tolist(), dtype=object)
+
+def _clean_text_series(s):
+    missing = s.isna()
+    cleaned = (
+        s.astype(object).astype(str)
+        .str.strip()
+        .str.replace('\u200b', '', regex=False)
+        .str.replace('\u00A0', '', regex=False)
+    )
+    # Drop a trailing ".0" only when it follows the first "." (clean_barcode splits on the first dot)
+    dot_zero = cleaned.str.endswith('.0') & (cleaned.str.find('.') == cleaned.str.len() - 2)
+    cleaned = cleaned.where(~dot_zero, cleaned.str.slice(stop=-2))
+    return cleaned.mask(missing, "").astype(object)
+
+def _clean_float_series(s):
+    values = s.to_numpy()
+    with np.errstate(invalid="ignore"):
+        whole = (
+            np.isfinite(values)
+            & (np.abs(values) < _WHOLE_FLOAT_LIMIT)
+            & (np.floor(values) == values)
+            & ~((values == 0) & np.signbit(values))
+        )
+    missing = np.isnan(values)
+    out = np.empty(len(values), dtype=object)
+    out[whole] = _int_strings(values[whole].astype(np.int64))
+    out[missing] = ""
+    rest = ~whole & ~missing
+    if rest.any():
+        out[rest] = _clean_text_series(pd.Series(values[rest])).to_numpy()
+    return pd.Series(out, index=s.index)
+
+def clean_barcode_series(values):
+    """Vectorized clean_barcode: same result for every element, without a Python-level loop."""
+    s = values if isinstance(values, pd.Series) else pd.Series(values)
+    if len(s) == 0:
+        return pd.Series([], index=s.index, dtype=object)
+    if s.dtype.kind in "mM":
+        # str() of datetime64 elements differs from the array formatter; keep exact parity
+        return s.map(clean_barcode)
+    if not isinstance(s.dtype, np.dtype):
+        return _clean_text_series(s)
+    if s.dtype.kind in "iu":
+        return pd.Series(_int_strings(s.to_numpy()), index=s.index)
+    if s.dtype.kind == "f":
+        return _clean_float_series(s)
+    return _clean_text_series(s)
@@ -0,0 +1,55 @@
+"""Micro-benchmark: row-by-row clean_barcode vs clean_barcode_series.
+
+Run from the repository root: python benchmarks/bench_clean_barcode.py
+"""
+import os
+import sys
+import time
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from barcode_utils import clean_barcode, clean_barcode_series
+
+SIZES = [10_000, 100_000, 1_000_000]
+
+def make_float_barcodes(n, seed=0):
+    # What read_excel returns for a numeric BARCODE column with blanks
+    rng = np.random.default_rng(seed)
+    values = rng.integers(1, 10**12, size=n).astype(float)
+    values[rng.random(n) < 0.05] = np.nan
+    return pd.Series(values)
+
+def make_mixed_barcodes(n, seed=0):
+    # Hand-typed codes: numbers, strings with stray whitespace/ZWSP/NBSP, ".0" suffixes, blanks
+    rng = np.random.default_rng(seed)
+    codes = rng.integers(1, 10**12, size=n)
+    values = codes.astype(float).astype(object)
+    kind = rng.integers(0, 5, size=n)
+    values[kind == 1] = [f" {c}\u200b" for c in codes[kind == 1]]
+    values[kind == 2] = [f"{c}.0\u00A0" for c in codes[kind == 2]]
+    values[kind == 3] = [str(c) for c in codes[kind == 3]]
+    values[kind == 4] = np.nan
+    return pd.Series(values, dtype=object)
+
+def best_of(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def main():
+    print(f"{'column':>7}  {'rows':>10}  {'map(clean_barcode)':>20}  {'clean_barcode_series':>22}  {'speedup':>8}")
+    for label, make in (("float", make_float_barcodes), ("mixed", make_mixed_barcodes)):
+        for n in SIZES:
+            values = make(n)
+            assert clean_barcode_series(values).tolist() == values.map(clean_barcode).tolist()
+            repeat = 5 if n < 1_000_000 else 2
+            scalar = best_of(lambda: values.map(clean_barcode), repeat)
+            vector = best_of(lambda: clean_barcode_series(values), repeat)
+            print(f"{label:>7}  {n:>10,}  {scalar * 1000:>18.1f}ms  {vector * 1000:>20.1f}ms  {scalar / vector:>7.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,314 @@
+"""Benchmark suite: the app's hot paths over synthetic inventories of growing size.
+
+Each (backend, size) pair runs in its own process against a scratch INVENTORY_DATA_DIR, so
+the real inventory is never touched and caches never leak between sizes. Results are
+written as JSON; pass an earlier result file to --compare to flag regressions.
+
+Run from the repository root:
+    python benchmarks/bench_hot_paths.py --sizes 1000,10000 --output bench_results.json
+    python benchmarks/bench_hot_paths.py --sizes 1000,10000 --compare bench_results.json
+
+The Excel backend rewrites the whole workbook on every write, so its 1M-row run takes
+a long time.
+"""
+import os
+import ast
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import tempfile
+import subprocess
+from datetime import datetime
+
+REPO_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, REPO_DIR)
+
+SIZES = [1_000, 10_000, 100_000, 1_000_000]
+LOOKUPS = 1000
+REQUESTS = 200
+ALLOCATIONS = 100
+IMAGES = 50
+# Codes in one bulk scan-list transfer / multi-select delete
+BULK_CODES = 500
+# Fraction of the main inventory seeded into the secondary inventory and the unfound list
+SECONDARY_FRACTION = 0.1
+UNFOUND_FRACTION = 0.01
+REGRESSION_THRESHOLD = 1.25
+
+SUPPLIERS = ["Essilor", "Luxottica", "Safilo", "Marcolin", "Kering", "Marchon", "Silhouette", "Rodenstock"]
+MANUFACTURERS = ["Ray-Ban", "Oakley", "Persol", "Gucci", "Prada", "Tom Ford", "Carrera", "Lindberg"]
+COLOURS = ["BLACK", "HAVANA", "GOLD", "SILVER", "BLUE", "RED", "CLEAR", "TORTOISE"]
+
+def visible_fields():
+    # add_product.py is a Streamlit page (importing it renders it), so read the list from its source
+    with open(os.path.join(REPO_DIR, "add_product.py")) as f:
+        tree = ast.parse(f.read())
+    for node in tree.body:
+        if isinstance(node, ast.Assign) and any(getattr(t, "id", None) == "VISIBLE_FIELDS" for t in node.targets):
+            return ast.literal_eval(node.value)
+    raise LookupError("VISIBLE_FIELDS not found in add_product.py")
+
+def make_inventory(n, seed=0):
+    """n products with the VISIBLE_FIELDS columns and value shapes like the real workbook.
+
+    Barcodes are mostly 13-digit supplier codes, with 1% in-house numbers from the allocator's range.
+    """
+    import numpy as np
+    import pandas as pd
+    rng = np.random.default_rng(seed)
+    barcodes = rng.choice(np.arange(9_300_000_000_000, 9_300_000_000_000 + 10 * n), size=n, replace=False)
+    in_house = rng.random(n) < 0.01
+    barcodes[in_house] = rng.choice(np.arange(1, 11_001), size=int(in_house.sum()), replace=in_house.sum() > 11_000)
+    supplier = rng.choice(SUPPLIERS, size=n)
+    framecodes = pd.Series(supplier).str[:3].str.upper() + pd.Series(np.arange(1, n + 1)).map("{:06d}".format)
+    columns = {
+        "BARCODE": barcodes,
+        "LOCATION": rng.choice(["SHOP", "STORE", "WINDOW"], size=n),
+        "FRAME NO.": framecodes,
+        "PKEY": pd.Series(rng.integers(1, 10**6, size=n)).map("P{:06d}".format),
+        "MANUFACTURER": rng.choice(MANUFACTURERS, size=n),
+        "MODEL": pd.Series(rng.integers(1000, 9999, size=n)).map("RB{}".format),
+        "SIZE": pd.Series(rng.integers(45, 60, size=n)).astype(str) + "-" + pd.Series(rng.integers(14, 22, size=n)).astype(str),
+        "F COLOUR": rng.choice(COLOURS, size=n),
+        "F GROUP": rng.choice(["METAL", "PLASTIC", "RIMLESS"], size=n),
+        "SUPPLIER": supplier,
+        "QUANTITY": rng.integers(0, 5, size=n),
+        "F TYPE": rng.choice(["MEN", "WOMEN", "KIDS", "UNISEX"], size=n),
+        "TEMPLE": rng.integers(135, 150, size=n),
+        "DEPTH": rng.integers(35, 50, size=n),
+        "DIAG": rng.integers(50, 65, size=n),
+        "BASECURVE": rng.choice(["2", "4", "6", "8"], size=n),
+        "RRP": rng.integers(99, 600, size=n).astype(float),
+        "EXCOSTPR": rng.integers(30, 200, size=n).astype(float),
+        "COST PRICE": rng.integers(33, 220, size=n).astype(float),
+        "TAXPC": "GST 10%",
+        "FRSTATUS": rng.choice(["CONSIGNMENT OWNED", "PRACTICE OWNED"], size=n),
+        "AVAIL FROM": pd.Series(pd.to_datetime("2020-01-01") + pd.to_timedelta(rng.integers(0, 1500, size=n), unit="D")).dt.strftime("%Y-%m-%d"),
+        "NOTE": np.where(rng.random(n) < 0.1, "display", None),
+    }
+    return pd.DataFrame({c: columns.get(c, "") for c in visible_fields()})
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return time.perf_counter() - start, result
+
+def best_of(fn, repeat):
+    return min(timed(fn)[0] for _ in range(repeat))
+
+def per_call(fn, args):
+    start = time.perf_counter()
+    for a in args:
+        fn(a)
+    return (time.perf_counter() - start) / len(args)
+
+def run_size(rows, backend, repeat):
+    """Time every hot path for one inventory size; runs inside the per-size worker process."""
+    import pandas as pd
+    from inventory_storage import get_table, strip_derived_columns, UNFOUND_COLUMNS
+    from workbook_cache import sidecar_path
+    from barcode_allocator import get_allocator
+    from framecode_sequence import framecode_prefix, reserve_framecodes
+    from barcode_images import render_barcode, clear_barcode_cache
+    from stock_count import reconcile_scan_file
+    from product_search import get_search_index
+    import barcode_server
+
+    results = []
+
+    def record(name, seconds, **extra):
+        results.append({"name": name, "rows": rows, "backend": backend, "seconds": seconds, **extra})
+
+    data_dir = os.environ["INVENTORY_DATA_DIR"]
+    df = make_inventory(rows)
+    main, secondary, unfound = get_table("main"), get_table("secondary"), get_table("unfound")
+    record("seed_inventory", timed(lambda: main.replace(df))[0])
+    secondary.replace(df.sample(frac=SECONDARY_FRACTION, random_state=1))
+    unfound_rows = max(int(rows * UNFOUND_FRACTION), 1)
+    unfound.replace(pd.DataFrame({
+        "BARCODE": [str(9_400_000_000_000 + i) for i in range(unfound_rows)],
+        "Timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+    }, columns=UNFOUND_COLUMNS))
+
+    # Loading as a restarted process does (a new table object): first without the workbook sidecar, then with it
+    def restart_load():
+        return type(main)(main.name, main.excel_path, main.default_columns).load()
+
+    if os.path.exists(sidecar_path(main.excel_path)):
+        os.remove(sidecar_path(main.excel_path))
+    record("load_cold", timed(restart_load)[0])
+    record("load_warm", best_of(restart_load, repeat))
+
+    # Lookups: half hits, half misses
+    rng = random.Random(0)
+    known = df["BARCODE"].astype(str).tolist()
+    codes = [rng.choice(known) if i % 2 else str(9_500_000_000_000 + i) for i in range(LOOKUPS)]
+    record("barcode_index_build", timed(lambda: barcode_server.find_product_by_barcode(codes[1], main))[0])
+    record("find_product_by_barcode", per_call(lambda c: barcode_server.find_product_by_barcode(c, main), codes), calls=len(codes))
+    client = barcode_server.app.test_client()
+    record("save_barcode", per_call(lambda c: client.post("/save_barcode", json={"barcode": c}), codes[:REQUESTS]), calls=REQUESTS)
+
+    # Product search: index build, then type-ahead queries (model, framecode prefix, misspelt manufacturer)
+    record("search_index_build", timed(lambda: get_search_index(main))[0])
+    queries = [str(df.at[i, "MODEL"]) for i in range(0, rows, max(rows // 10, 1))]
+    queries += [str(df.at[i, "FRAME NO."])[:5] for i in range(0, rows, max(rows // 10, 1))]
+    queries += ["rayban blak", "okley", "tom frd"]
+    record("product_search", per_call(lambda q: get_search_index(main).search(q), queries), calls=len(queries))
+
+    # Code generation
+    record("generate_unique_barcode_first", timed(lambda: get_allocator(main).allocate(1))[0])
+    record("generate_unique_barcode", per_call(lambda _: get_allocator(main).allocate(1), range(ALLOCATIONS)), calls=ALLOCATIONS)
+    counters = os.path.join(data_dir, "bench_framecode_counters.json")
+    framecodes = main.load_cached()["FRAME NO."]
+    prefix = framecode_prefix(SUPPLIERS[0])
+    record("generate_framecode_first", timed(lambda: reserve_framecodes(prefix, 1, framecodes, path=counters))[0])
+    record("generate_framecode", per_call(lambda _: reserve_framecodes(prefix, 1, framecodes, path=counters), range(ALLOCATIONS)), calls=ALLOCATIONS)
+
+    # Persistence: add, reload, edit, delete, as the add/edit/delete forms do
+    add, reload, edit, delete = [], [], [], []
+    row = strip_derived_columns(df.iloc[[0]]).iloc[0].to_dict()
+    for i in range(repeat):
+        row = dict(row, **{"BARCODE": get_allocator(main).allocate(1)[0], "FRAME NO.": f"BEN{i:06d}"})
+        seconds, row_id = timed(lambda: main.insert(row))
+        add.append(seconds)
+        seconds, current = timed(main.load_cached)
+        reload.append(seconds)
+        base = current.loc[row_id].to_dict()
+        edit.append(timed(lambda: main.merge_update(row_id, {"NOTE": f"bench {i}"}, base))[0])
+        base = main.load_cached().loc[row_id].to_dict()
+        delete.append(timed(lambda: main.checked_delete(row_id, base))[0])
+    record("add_product", min(add))
+    record("reload_after_write", min(reload))
+    record("edit_product", min(edit))
+    record("delete_product", min(delete))
+
+    # Stock count: one scan per inventory row, 2% of them unknown
+    scan_path = os.path.join(data_dir, "bench_scans.csv")
+    scans = [rng.choice(known) if rng.random() > 0.02 else "9600000000000" for _ in range(rows)]
+    pd.DataFrame({"BARCODE": scans}).to_csv(scan_path, index=False)
+    inventory = main.load_cached()
+    record("stock_count_reconcile", best_of(lambda: reconcile_scan_file(inventory, scan_path, scan_path, "BARCODE"), repeat))
+
+    # Inventory Check transfers: set membership, then a one-row insert / delete, as the page does
+    from key_index import get_key_set
+
+    def add_to_secondary(barcode):
+        with secondary.transaction() as (current, previous):
+            keys = get_key_set(secondary)
+            if barcode not in keys:
+                secondary.insert_many([dict(row, BARCODE=barcode)], prepend=True)
+                keys.record(previous, secondary.version(), added=[barcode])
+
+    def add_to_unfound(barcode):
+        with unfound.transaction() as (current, previous):
+            keys = get_key_set(unfound)
+            if barcode not in keys:
+                unfound.insert_many([{"BARCODE": barcode, "Timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S")}], prepend=True)
+                keys.record(previous, unfound.version(), added=[barcode])
+
+    transfers = {"add_to_secondary": [], "add_to_unfound": [], "remove_from_secondary": [], "delete_unfound_barcode": []}
+    for i in range(repeat):
+        barcode = str(9_700_000_000_000 + i)
+        transfers["add_to_secondary"].append(timed(lambda: add_to_secondary(barcode))[0])
+        transfers["remove_from_secondary"].append(timed(lambda: secondary.delete_barcode(barcode))[0])
+        transfers["add_to_unfound"].append(timed(lambda: add_to_unfound(barcode))[0])
+        transfers["delete_unfound_barcode"].append(timed(lambda: unfound.delete_barcode(barcode))[0])
+    for name, seconds in transfers.items():
+        record(name, min(seconds))
+
+    # Bulk: a scan list of BULK_CODES codes into each list in one write, then one multi-code delete
+    batch = [str(9_800_000_000_000 + i) for i in range(BULK_CODES)]
+    record("bulk_transfer", timed(lambda: unfound.insert_many([{"BARCODE": c, "Timestamp": "bench"} for c in batch], prepend=True))[0], codes=BULK_CODES)
+    record("bulk_delete_unfound", timed(lambda: unfound.delete_barcodes(batch))[0], codes=BULK_CODES)
+
+    # Barcode images: first render of each code, then the cached path
+    image_codes = known[:IMAGES]
+    clear_barcode_cache()
+    record("render_barcode", per_call(render_barcode, image_codes), calls=len(image_codes))
+    record("render_barcode_cached", per_call(render_barcode, image_codes), calls=len(image_codes))
+    return results
+
+def default_repeat(rows):
+    return 5 if rows <= 10_000 else 3 if rows <= 100_000 else 1
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=REPO_DIR, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run_worker(rows, backend, repeat):
+    """Run one size in a fresh process with a scratch data directory; returns its result rows."""
+    with tempfile.TemporaryDirectory(prefix=f"bench-{backend}-{rows}-") as data_dir:
+        env = dict(os.environ, INVENTORY_DATA_DIR=data_dir, INVENTORY_BACKEND=backend, BARCODE_IMAGE_CACHE_DIR="")
+        proc = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--worker", "--sizes", str(rows), "--backends", backend, "--repeat", str(repeat)],
+            env=env, capture_output=True, text=True,
+        )
+    if proc.returncode != 0:
+        raise RuntimeError(f"{backend} at {rows:,} rows failed:\n{proc.stderr}")
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+def compare(results, baseline, threshold=REGRESSION_THRESHOLD):
+    """(name, rows, backend, old seconds, new seconds, ratio) for every benchmark slower than `threshold` times."""
+    old = {(r["name"], r["rows"], r["backend"]): r["seconds"] for r in baseline["results"]}
+    regressions = []
+    for r in results:
+        key = (r["name"], r["rows"], r["backend"])
+        if key in old and old[key] > 0 and r["seconds"] / old[key] > threshold:
+            regressions.append(key + (old[key], r["seconds"], r["seconds"] / old[key]))
+    return regressions
+
+def print_results(results):
+    print(f"{'benchmark':<30} {'backend':>8} {'rows':>10} {'time':>12}")
+    for r in results:
+        print(f"{r['name']:<30} {r['backend']:>8} {r['rows']:>10,} {r['seconds'] * 1000:>10.3f}ms")
+
+def main():
+    parser = argparse.ArgumentParser(description="Time the app's hot paths over synthetic inventories.")
+    parser.add_argument("--sizes", default=",".join(map(str, SIZES)), help="comma-separated row counts")
+    parser.add_argument("--backends", default=os.environ.get("INVENTORY_BACKEND", "excel"), help="comma-separated storage backends")
+    parser.add_argument("--repeat", type=int, default=None, help="repetitions per timing (default: fewer for larger sizes)")
+    parser.add_argument("--output", default=None, help="write the results to this JSON file")
+    parser.add_argument("--compare", default=None, help="earlier JSON results to check for regressions")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD, help="slowdown ratio reported as a regression")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    sizes = [int(s) for s in args.sizes.split(",")]
+    backends = args.backends.split(",")
+
+    if args.worker:
+        print(json.dumps(run_size(sizes[0], backends[0], args.repeat)))
+        return
+
+    results = []
+    for backend in backends:
+        for rows in sizes:
+            print(f"Running {backend} at {rows:,} rows...", file=sys.stderr)
+            results.extend(run_worker(rows, backend, args.repeat or default_repeat(rows)))
+    print_results(results)
+    report = {
+        "meta": {
+            "commit": _git_commit(),
+            "date": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+        },
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=1)
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        for name, rows, backend, old, new, ratio in regressions:
+            print(f"REGRESSION {name} ({backend}, {rows:,} rows): {old * 1000:.3f}ms -> {new * 1000:.3f}ms ({ratio:.2f}x)")
+        if regressions:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+import re
+from datetime import datetime
+import pandas as pd
+from barcode_utils import clean_barcode_series
+from barcode_allocator import get_allocator
+from framecode_sequence import framecode_prefix, reserve_framecodes, observe_framecodes
+from inventory_storage import BARCODE_COLUMN, FRAMECODE_COLUMN, ROW_STAMP_COLUMN, strip_derived_columns
+
+CATALOG_FILE_TYPES = ["csv", "xlsx"]
+NUMERIC_FIELDS = ["RRP", "COST PRICE"]
+ISSUE_COLUMNS = ["ROW", "FIELD", "VALUE", "PROBLEM"]
+# Supplier headings (normalized: upper case, letters and digits only) that mean one of our fields
+COLUMN_ALIASES = {
+    "EAN": BARCODE_COLUMN, "UPC": BARCODE_COLUMN, "GTIN": BARCODE_COLUMN, "BARCODE": BARCODE_COLUMN,
+    "FRAMECODE": FRAMECODE_COLUMN, "FRAMENO": FRAMECODE_COLUMN, "FRAMENUMBER": FRAMECODE_COLUMN,
+    "BRAND": "MANUFACTURER", "MAKE": "MANUFACTURER",
+    "STYLE": "MODEL", "MODELNO": "MODEL", "MODELNUMBER": "MODEL",
+    "COLOUR": "F COLOUR", "COLOR": "F COLOUR", "COLOURCODE": "F COLOUR", "COLORCODE": "F COLOUR",
+    "EYESIZE": "SIZE", "QTY": "QUANTITY", "GENDER": "F TYPE",
+    "RETAIL": "RRP", "RETAILPRICE": "RRP", "RECOMMENDEDRETAILPRICE": "RRP",
+    "COST": "COST PRICE", "WHOLESALE": "COST PRICE", "WHOLESALEPRICE": "COST PRICE",
+    "TAX": "TAXPC", "GST": "TAXPC", "STATUS": "FRSTATUS",
+}
+
+def _heading(name):
+    return re.sub(r"[^A-Z0-9]", "", str(name).upper())
+
+def read_catalog(source, name):
+    """Supplier spreadsheet as text, so codes keep their leading zeros."""
+    file_type = name.rsplit(".", 1)[-1].lower()
+    if file_type not in CATALOG_FILE_TYPES:
+        raise ValueError(f"Unsupported file type '{file_type}'. Choose from: {', '.join(CATALOG_FILE_TYPES)}")
+    if file_type == "xlsx":
+        return pd.read_excel(source, dtype=str)
+    return pd.read_csv(source, dtype=str)
+
+def suggest_mapping(columns, fields):
+    """Supplier column -> our field (or None): same heading first, then COLUMN_ALIASES; each field used once."""
+    by_heading = {_heading(f): f for f in fields}
+    mapping, used = {}, set()
+    for column in columns:
+        heading = _heading(column)
+        field = by_heading.get(heading) or COLUMN_ALIASES.get(heading)
+        if field in fields and field not in used:
+            mapping[column] = field
+            used.add(field)
+        else:
+            mapping[column] = None
+    return mapping
+
+def map_catalog(raw, mapping):
+    """The supplier rows under our field names; unmapped columns are dropped."""
+    chosen = {column: field for column, field in mapping.items() if field}
+    batch = raw[list(chosen)].rename(columns=chosen)
+    batch = batch.apply(lambda col: col.str.strip() if col.dtype == object or pd.api.types.is_string_dtype(col) else col)
+    return batch.replace("", pd.NA).reset_index(drop=True)
+
+def _missing(batch, field):
+    return batch[field].isna() if field in batch.columns else pd.Series(True, index=batch.index)
+
+def _enum_key(values):
+    return clean_barcode_series(values).str.upper()
+
+def canonical_enums(batch, enums, inventory):
+    """Spell enum values the way the form (or, for legacy codes, the inventory) does.
+
+    Matching ignores case, and a bare TAXPC rate ("10", "10%") becomes the form's "GST 10%".
+    """
+    batch = batch.copy()
+    for field, options in enums.items():
+        if field not in batch.columns:
+            continue
+        known = list(options)
+        if field in inventory.columns:
+            known += inventory[field].dropna().unique().tolist()
+        spelling = dict(zip(_enum_key(pd.Series(known, dtype=object)), known))
+        values = batch[field]
+        keys = _enum_key(values)
+        if field == "TAXPC":
+            rates = keys.str.fullmatch(r"\d+%?")
+            keys = keys.where(~rates, "GST " + keys.str.rstrip("%") + "%")
+        canonical = keys.map(spelling)
+        batch[field] = canonical.where(canonical.notna(), values)
+    return batch
+
+def validate_catalog(batch, inventory, enums):
+    """Every problem in the batch, one row per (row, field): ROW is the 1-based row in the supplier file.
+
+    Checks run column-wise: duplicate barcodes / framecodes within the file and against the
+    inventory, numeric RRP / COST PRICE, enum fields, and a SUPPLIER wherever a framecode has
+    to be generated.
+    """
+    issues = []
+
+    def flag(mask, field, problem):
+        if mask.any():
+            issues.append(pd.DataFrame({
+                "ROW": batch.index[mask] + 1, "FIELD": field, "VALUE": batch.loc[mask, field], "PROBLEM": problem,
+            }))
+
+    for field, inventory_clean in ((BARCODE_COLUMN, "BARCODE_CLEAN"), (FRAMECODE_COLUMN, "FRAME_CLEAN")):
+        if field not in batch.columns:
+            continue
+        keys = clean_barcode_series(batch[field])
+        given = keys != ""
+        flag(given & keys.duplicated(keep=False), field, "repeated in this file")
+        if inventory_clean in inventory.columns:
+            flag(given & keys.isin(set(inventory[inventory_clean])), field, "already in inventory")
+    for field in NUMERIC_FIELDS:
+        if field in batch.columns:
+            values = batch[field]
+            numbers = pd.to_numeric(values, errors="coerce")
+            flag(values.notna() & numbers.isna(), field, "not a number")
+            flag(numbers < 0, field, "negative")
+    for field, options in enums.items():
+        if field in batch.columns:
+            known = set(_enum_key(pd.Series(list(options), dtype=object)))
+            if field in inventory.columns:
+                known |= set(_enum_key(inventory[field].dropna()))
+            values = batch[field]
+            shown = ", ".join(options) if len(options) <= 6 else f"{options[0]} ... {options[-1]}"
+            flag(values.notna() & ~_enum_key(values).isin(known), field, f"not one of: {shown}")
+    missing = _missing(batch, FRAMECODE_COLUMN) & _missing(batch, "SUPPLIER")
+    if missing.any():
+        issues.append(pd.DataFrame({
+            "ROW": batch.index[missing] + 1, "FIELD": "SUPPLIER", "VALUE": pd.NA,
+            "PROBLEM": "needed to generate a framecode",
+        }))
+    if not issues:
+        return pd.DataFrame(columns=ISSUE_COLUMNS)
+    return pd.concat(issues, ignore_index=True).sort_values(["ROW", "FIELD"], kind="stable").reset_index(drop=True)
+
+def dry_run(batch, inventory, enums):
+    """(issues, summary) for a batch without reserving any codes or writing anything."""
+    batch = canonical_enums(batch, enums, inventory)
+    issues = validate_catalog(batch, inventory, enums)
+    summary = {
+        "rows": len(batch),
+        "rows with problems": int(issues["ROW"].nunique()),
+        "barcodes to generate": int(_missing(batch, BARCODE_COLUMN).sum()),
+        "framecodes to generate": int(_missing(batch, FRAMECODE_COLUMN).sum()),
+    }
+    return issues, summary
+
+def assign_codes(batch, table, framecodes):
+    """Fill blank barcodes from the table's allocator and blank framecodes per supplier prefix, in bulk."""
+    batch = batch.copy()
+    missing = _missing(batch, BARCODE_COLUMN)
+    if missing.any():
+        allocator = get_allocator(table)
+        # The file's own barcodes are not in the inventory yet: keep them out of the allocation
+        if BARCODE_COLUMN in batch.columns:
+            allocator.mark_used(clean_barcode_series(batch.loc[~missing, BARCODE_COLUMN]))
+        batch[BARCODE_COLUMN] = batch.get(BARCODE_COLUMN, pd.Series(pd.NA, index=batch.index)).astype(object)
+        batch.loc[missing, BARCODE_COLUMN] = allocator.allocate(int(missing.sum()))
+    missing = _missing(batch, FRAMECODE_COLUMN)
+    if missing.any():
+        batch[FRAMECODE_COLUMN] = batch.get(FRAMECODE_COLUMN, pd.Series(pd.NA, index=batch.index)).astype(object)
+        prefixes = batch.loc[missing, "SUPPLIER"].astype(str).map(framecode_prefix)
+        for prefix, rows in prefixes.groupby(prefixes).groups.items():
+            batch.loc[rows, FRAMECODE_COLUMN] = reserve_framecodes(prefix, len(rows), framecodes)
+    return batch
+
+def commit_catalog(batch, table, enums):
+    """Validate again under the table's write lock, assign missing codes and insert every row in one write.
+
+    Returns (row ids, issues); nothing is written (and no code reserved) when there are issues.
+    """
+    with table.transaction() as (inventory, _):
+        batch = canonical_enums(batch, enums, inventory)
+        issues = validate_catalog(batch, inventory, enums)
+        if len(issues):
+            return [], issues
+        supplied = batch[FRAMECODE_COLUMN].dropna().astype(str) if FRAMECODE_COLUMN in batch.columns else pd.Series(dtype=object)
+        framecodes = inventory[FRAMECODE_COLUMN] if FRAMECODE_COLUMN in inventory.columns else pd.Series(dtype=object)
+        # Move the framecode counters past the supplier's own codes before generating any
+        observe_framecodes(supplied, framecodes)
+        batch = assign_codes(batch, table, framecodes)
+        for field in NUMERIC_FIELDS:
+            if field in batch.columns:
+                batch[field] = pd.to_numeric(batch[field])
+        # Columns the file does not fill are left blank, as the add form does
+        rows = batch.reindex(columns=strip_derived_columns(inventory).columns)
+        rows = rows.astype(object).where(rows.notna(), "")
+        if ROW_STAMP_COLUMN in inventory.columns:
+            rows[ROW_STAMP_COLUMN] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        row_ids = table.insert_many(rows.to_dict("records"))
+    return row_ids, issues
@@ -0,0 +1,135 @@
+import os
+import json
+import tempfile
+import threading
+from file_lock import locked
+
+try:
+    from watchdog.observers import Observer
+    from watchdog.events import FileSystemEventHandler, EVENT_TYPE_OPENED, EVENT_TYPE_CLOSED_NO_WRITE
+except ImportError:  # optional: without watchdog (inotify on Linux) the watcher polls
+    Observer = None
+    FileSystemEventHandler = object
+
+# "auto" uses inotify through watchdog when installed and polls otherwise; "poll" always polls;
+# "off" disables the watcher so every version() call stats the store again
+INVENTORY_WATCH = os.environ.get("INVENTORY_WATCH", "auto").lower()
+INVENTORY_POLL_INTERVAL = float(os.environ.get("INVENTORY_POLL_INTERVAL", "1"))
+
+def read_sequence(path):
+    """Per-table write counters ({table name: n}) shared by every process."""
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+def bump_sequence(path, name):
+    """Record one more committed write to table `name`; watchers in other processes see the rename."""
+    with locked(path):
+        sequence = read_sequence(path)
+        sequence[name] = sequence.get(name, 0) + 1
+        directory, base = os.path.split(path)
+        fd, tmp_path = tempfile.mkstemp(prefix=base + ".", suffix=".tmp", dir=directory)
+        with os.fdopen(fd, "w") as f:
+            json.dump(sequence, f)
+        os.replace(tmp_path, path)
+        return sequence[name]
+
+def _stat_key(path):
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+class _EventHandler(FileSystemEventHandler):
+    def __init__(self, watcher):
+        super().__init__()
+        self.watcher = watcher
+
+    def on_any_event(self, event):
+        # Reads open and close the files too; only writes, renames and deletes are changes
+        if event.event_type in (EVENT_TYPE_OPENED, EVENT_TYPE_CLOSED_NO_WRITE):
+            return
+        paths = {os.path.abspath(os.fsdecode(event.src_path))}
+        if getattr(event, "dest_path", ""):
+            paths.add(os.path.abspath(os.fsdecode(event.dest_path)))
+        if paths & self.watcher.paths:
+            self.watcher.changed()
+
+class ChangeWatcher:
+    """Process-wide change signal for the inventory files.
+
+    `generation` moves whenever a watched file changes, so callers can keep parsed data and
+    skip even the stat() until it does. After a fork the child's watcher is inactive (its
+    threads did not survive), and callers fall back to checking the store on every call.
+    """
+
+    def __init__(self, mode=INVENTORY_WATCH, poll_interval=INVENTORY_POLL_INTERVAL):
+        self.mode = "poll" if mode == "auto" and Observer is None else mode
+        self.poll_interval = poll_interval
+        self.paths = set()
+        self.generation = 0
+        self._cond = threading.Condition()
+        self._directories = set()
+        self._stats = {}
+        self._observer = None
+        self._poller = None
+        self._pid = os.getpid()
+
+    def is_active(self):
+        return self._pid == os.getpid()
+
+    def watch(self, paths):
+        with self._cond:
+            for path in map(os.path.abspath, paths):
+                if path in self.paths:
+                    continue
+                self.paths.add(path)
+                self._stats[path] = _stat_key(path)
+                directory = os.path.dirname(path)
+                if self.mode == "auto" and directory not in self._directories:
+                    if self._observer is None:
+                        self._observer = Observer()
+                        self._observer.start()
+                    self._observer.schedule(_EventHandler(self), directory, recursive=False)
+                    self._directories.add(directory)
+            if self.mode == "poll" and self._poller is None:
+                self._poller = threading.Thread(target=self._poll_loop, name="inventory-change-poller", daemon=True)
+                self._poller.start()
+
+    def changed(self):
+        with self._cond:
+            self.generation += 1
+            self._cond.notify_all()
+
+    def wait(self, generation, timeout=None):
+        """Block until the generation moves past `generation` (or timeout); returns the current one."""
+        with self._cond:
+            self._cond.wait_for(lambda: self.generation != generation, timeout)
+            return self.generation
+
+    def _poll_loop(self):
+        while True:
+            with self._cond:
+                self._cond.wait(self.poll_interval)
+                paths = list(self.paths)
+            for path in paths:
+                stat = _stat_key(path)
+                if stat != self._stats.get(path):
+                    self._stats[path] = stat
+                    self.changed()
+
+_watcher = None
+_watcher_lock = threading.Lock()
+
+def get_watcher():
+    """The process's watcher, or None when INVENTORY_WATCH=off."""
+    global _watcher
+    if INVENTORY_WATCH == "off":
+        return None
+    with _watcher_lock:
+        if _watcher is None or _watcher._pid != os.getpid():
+            _watcher = ChangeWatcher()
+        return _watcher
@@ -0,0 +1,224 @@
+import os
+import re
+import json
+import tempfile
+import threading
+from collections import deque
+from datetime import datetime
+import pandas as pd
+from file_lock import locked
+from barcode_utils import clean_barcode
+from inventory_storage import APP_DIR
+from stock_count import expected_stock, reconcile
+
+# Each session is a checkpoint (counts as of a scan sequence number) plus an fsync'd log of
+# the scans after it, so a refresh or crash loses nothing; the log is folded into a new
+# checkpoint every COUNT_CHECKPOINT_EVERY scans to keep resuming fast.
+COUNT_SESSION_DIR = os.path.join(APP_DIR, "stock_counts")
+COUNT_CHECKPOINT_EVERY = int(os.environ.get("COUNT_CHECKPOINT_EVERY", "500"))
+RECENT_SCANS = 20
+
+def _safe_name(name):
+    name = re.sub(r"[^A-Za-z0-9_-]+", "-", name.strip()).strip("-")
+    if not name:
+        raise ValueError("Session name cannot be empty.")
+    return name
+
+class CountSession:
+    """Running stock count: scans are O(1) counter updates against a resident expected-stock index.
+
+    Totals are maintained as scans arrive:
+    units counted, units within expected stock, units over expected, unexpected units.
+    """
+
+    def __init__(self, name, directory=COUNT_SESSION_DIR):
+        self.name = _safe_name(name)
+        self.checkpoint_path = os.path.join(directory, f"{self.name}.checkpoint.json")
+        self.log_path = os.path.join(directory, f"{self.name}.scans.jsonl")
+        self._lock = threading.RLock()
+        self.counts = {}
+        self.recent = deque(maxlen=RECENT_SCANS)
+        self.started = None
+        self._seq = 0
+        self._checkpoint_seq = 0
+        self._version = None
+        self._expected = {}
+        self.expected_units = 0
+        os.makedirs(directory, exist_ok=True)
+        self._load()
+
+    # Persistence
+
+    def _load(self):
+        with locked(self.log_path):
+            try:
+                with open(self.checkpoint_path) as f:
+                    checkpoint = json.load(f)
+            except FileNotFoundError:
+                checkpoint = {}
+            self.counts = {k: int(v) for k, v in checkpoint.get("counts", {}).items()}
+            self.started = checkpoint.get("started")
+            # Newest first, as held in memory; scans logged after the checkpoint go in front
+            self.recent.extend(tuple(scan) for scan in checkpoint.get("recent", []))
+            self._seq = self._checkpoint_seq = checkpoint.get("seq", 0)
+            try:
+                with open(self.log_path, "rb") as f:
+                    data = f.read()
+            except FileNotFoundError:
+                data = b""
+        for line in data.splitlines():
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue  # torn final write
+            if entry["seq"] <= self._seq:
+                continue
+            self.counts[entry["barcode"]] = self.counts.get(entry["barcode"], 0) + entry["delta"]
+            if self.counts[entry["barcode"]] <= 0:
+                del self.counts[entry["barcode"]]
+            self.recent.appendleft((entry["barcode"], entry["delta"], entry["time"]))
+            self._seq = entry["seq"]
+            self.started = self.started or entry["time"]
+
+    def _log(self, barcode, delta, when):
+        self._seq += 1
+        line = json.dumps({"seq": self._seq, "barcode": barcode, "delta": delta, "time": when}) + "\n"
+        with locked(self.log_path), open(self.log_path, "a") as f:
+            f.write(line)
+            f.flush()
+            os.fsync(f.fileno())
+        if self._seq - self._checkpoint_seq >= COUNT_CHECKPOINT_EVERY:
+            self.checkpoint()
+
+    def checkpoint(self):
+        """Fold the scan log into the checkpoint (temp file + atomic rename), then truncate the log."""
+        with self._lock, locked(self.log_path):
+            fd, tmp_path = tempfile.mkstemp(prefix=self.name + ".", suffix=".tmp", dir=os.path.dirname(self.checkpoint_path))
+            with os.fdopen(fd, "w") as f:
+                json.dump({"seq": self._seq, "started": self.started, "counts": self.counts, "recent": list(self.recent)}, f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.checkpoint_path)
+            # Entries up to seq are now in the checkpoint; a crash before this truncation only
+            # leaves lines the next load skips by sequence number
+            open(self.log_path, "w").close()
+            self._checkpoint_seq = self._seq
+
+    def discard(self):
+        with self._lock, locked(self.log_path):
+            for path in (self.checkpoint_path, self.log_path):
+                if os.path.exists(path):
+                    os.remove(path)
+            self.counts = {}
+            self.recent.clear()
+            self.started = None
+            self._seq = self._checkpoint_seq = 0
+            self._recount()
+
+    # Expected stock
+
+    def sync(self, version, df):
+        """Rebuild the expected-stock index when the inventory changes; totals are recounted once."""
+        with self._lock:
+            if self._version == version:
+                return
+            stock = expected_stock(df)
+            self._expected = stock["EXPECTED"].round().astype("int64").to_dict()
+            self.expected_units = sum(e for e in self._expected.values() if e > 0)
+            self._version = version
+            self._recount()
+
+    def _recount(self):
+        self.units = sum(self.counts.values())
+        self.within_units = 0
+        self.over_units = 0
+        self.unexpected_units = 0
+        for barcode, count in self.counts.items():
+            self._tally(barcode, 0, count)
+
+    def _tally(self, barcode, before, after):
+        # Move the totals for `barcode` from `before` to `after` scanned units
+        expected = self._expected.get(barcode)
+        if expected is None:
+            self.unexpected_units += after - before
+            return
+        expected = max(expected, 0)
+        self.within_units += min(after, expected) - min(before, expected)
+        self.over_units += max(after - expected, 0) - max(before - expected, 0)
+
+    # Scanning
+
+    def scan(self, barcode, delta=1):
+        """Count one scan (or undo one with delta=-1); returns (barcode, counted, expected)."""
+        barcode = clean_barcode(barcode)
+        if not barcode:
+            raise ValueError("Empty scan.")
+        with self._lock:
+            before = self.counts.get(barcode, 0)
+            after = max(before + delta, 0)
+            if after == before:
+                return barcode, before, self._expected.get(barcode)
+            when = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            self.started = self.started or when
+            if after:
+                self.counts[barcode] = after
+            else:
+                del self.counts[barcode]
+            self.units += after - before
+            self._tally(barcode, before, after)
+            self.recent.appendleft((barcode, after - before, when))
+            self._log(barcode, after - before, when)
+            return barcode, after, self._expected.get(barcode)
+
+    def undo_last(self):
+        """Take back the most recent scan that has not been undone yet."""
+        with self._lock:
+            undone = 0
+            for barcode, delta, _ in self.recent:
+                if delta < 0:
+                    undone += 1
+                elif undone:
+                    undone -= 1
+                else:
+                    return self.scan(barcode, -1)
+        return None
+
+    def status(self, barcode):
+        """(counted, expected) for a normalized barcode; expected is None if it is not in inventory."""
+        with self._lock:
+            return self.counts.get(barcode, 0), self._expected.get(barcode)
+
+    def totals(self):
+        return {
+            "scanned": self.units,
+            "distinct": len(self.counts),
+            "matched": self.within_units,
+            "over": self.over_units,
+            "short": self.expected_units - self.within_units,
+            "unexpected": self.unexpected_units,
+        }
+
+    def report(self, df):
+        """Full variance report for the counts so far (see stock_count.reconcile)."""
+        with self._lock:
+            counts = pd.Series(self.counts, dtype="int64")
+        return reconcile(df, counts)
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+def get_count_session(name, table):
+    """Process-wide session `name`, resumed from disk on first use and synced to `table`."""
+    key = (_safe_name(name), table.name)
+    with _sessions_lock:
+        if key not in _sessions:
+            _sessions[key] = CountSession(name)
+        session = _sessions[key]
+    session.sync(table.version(), table.load_cached())
+    return session
+
+def list_count_sessions(directory=COUNT_SESSION_DIR):
+    if not os.path.isdir(directory):
+        return []
+    names = {f.split(".")[0] for f in os.listdir(directory) if f.endswith((".checkpoint.json", ".scans.jsonl"))}
+    return sorted(names)
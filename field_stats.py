@@ -0,0 +1,122 @@
+import threading
+from collections import Counter
+import pandas as pd
+
+def _blank(value):
+    # A form's empty field is saved as "" (Excel reads it back as NaN); neither counts as a value
+    return pd.isnull(value) or (isinstance(value, str) and value == "")
+
+class FieldStats:
+    """Most recent value and value counts per column of one table, for form defaults.
+
+    A column is summarized the first time it is asked about for an inventory version; the
+    app's own inserts, edits and deletes are then applied as deltas instead of rescanning.
+    Row ids are compared as positions, which holds for every backend (rows load in id order).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        self._df = None
+        self._recent = {}  # column -> (row_id, value) of the last non-null value; dropped when stale
+        self._counts = {}  # column -> Counter of non-null values
+
+    def sync(self, version, df):
+        """Point at the current frame; a version we did not record ourselves resets every summary."""
+        with self._lock:
+            self._df = df
+            if self._version != version:
+                self._version = version
+                self._recent.clear()
+                self._counts.clear()
+
+    def _has_column(self, column):
+        return self._df is not None and column in self._df.columns
+
+    def recent(self, column):
+        with self._lock:
+            if not self._has_column(column):
+                return None
+            if column not in self._recent:
+                values = self._df[column]
+                row_id = values[values.notna() & (values != "")].last_valid_index()
+                self._recent[column] = (row_id, None if row_id is None else values.at[row_id])
+            return self._recent[column][1]
+
+    def mode(self, column):
+        with self._lock:
+            if not self._has_column(column):
+                return None
+            if column not in self._counts:
+                counts = Counter(self._df[column].value_counts(dropna=True).to_dict())
+                counts.pop("", None)
+                self._counts[column] = counts
+            counts = self._counts[column]
+            if not counts:
+                return None
+            top = max(counts.values())
+            tied = [value for value, n in counts.items() if n == top]
+            try:
+                return min(tied)  # Series.mode() returns ties sorted
+            except TypeError:
+                return tied[0]
+
+    def _add(self, column, value, delta):
+        if column in self._counts and not _blank(value):
+            counts = self._counts[column]
+            counts[value] += delta
+            if counts[value] <= 0:
+                del counts[value]
+
+    def record_insert(self, previous, version, row_id, row):
+        """Account for `row` appended as `row_id` by a write from version `previous` to `version`."""
+        with self._lock:
+            if self._version != previous:
+                self._version = None  # missed someone else's write: rebuild on next sync
+                return
+            for column, value in row.items():
+                self._add(column, value, 1)
+                if not _blank(value):
+                    self._recent[column] = (row_id, value)
+            self._version = version
+
+    def record_update(self, previous, version, row_id, old_row, new_row):
+        with self._lock:
+            if self._version != previous:
+                self._version = None
+                return
+            for column, value in new_row.items():
+                self._add(column, old_row.get(column), -1)
+                self._add(column, value, 1)
+                if column not in self._recent:
+                    continue
+                holder = self._recent[column][0]
+                if holder is None or row_id >= holder:
+                    if not _blank(value):
+                        self._recent[column] = (row_id, value)
+                    elif row_id == holder:
+                        del self._recent[column]
+            self._version = version
+
+    def record_delete(self, previous, version, row_id, old_row):
+        with self._lock:
+            if self._version != previous:
+                self._version = None
+                return
+            for column, value in old_row.items():
+                self._add(column, value, -1)
+                holder = self._recent.get(column, (None,))[0]
+                # Deleting at or before the holder may renumber it (Excel ids are positions)
+                if holder is not None and row_id <= holder:
+                    del self._recent[column]
+            self._version = version
+
+_stats = {}
+_stats_lock = threading.Lock()
+
+def get_field_stats(table):
+    """Process-wide field statistics for `table`, in step with its current inventory version."""
+    with _stats_lock:
+        stats = _stats.setdefault(table.name, FieldStats())
+    stats.sync(table.version(), table.load_cached())
+    return stats
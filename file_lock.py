@@ -0,0 +1,45 @@
+import os
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: fall back to in-process locking only
+    fcntl = None
+
+class _PathLock:
+    def __init__(self):
+        self.rlock = threading.RLock()
+        self.depth = 0
+        self.handle = None
+
+_path_locks = {}
+_path_locks_guard = threading.Lock()
+
+def _path_lock(lock_path):
+    with _path_locks_guard:
+        if lock_path not in _path_locks:
+            _path_locks[lock_path] = _PathLock()
+        return _path_locks[lock_path]
+
+@contextmanager
+def locked(path):
+    """Exclusive advisory lock on `path + ".lock"`, shared by threads and processes.
+
+    Re-entrant within a thread, so helpers that take the lock can call each other.
+    """
+    lock_path = os.path.abspath(path) + ".lock"
+    entry = _path_lock(lock_path)
+    with entry.rlock:
+        entry.depth += 1
+        try:
+            if entry.depth == 1 and fcntl is not None:
+                entry.handle = open(lock_path, "a")
+                fcntl.flock(entry.handle, fcntl.LOCK_EX)
+            yield
+        finally:
+            if entry.depth == 1 and entry.handle is not None:
+                fcntl.flock(entry.handle, fcntl.LOCK_UN)
+                entry.handle.close()
+                entry.handle = None
+            entry.depth -= 1
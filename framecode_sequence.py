@@ -0,0 +1,96 @@
+import os
+import json
+import tempfile
+import pandas as pd
+from file_lock import locked
+from inventory_storage import APP_DIR
+
+# Last issued number per supplier prefix, e.g. {"ESS": 35}. Seeded lazily from the
+# inventory the first time a prefix is used, then only ever moves forward.
+FRAMECODE_COUNTERS = os.path.join(APP_DIR, "framecode_counters.json")
+FRAMECODE_DIGITS = 6
+
+def framecode_prefix(supplier):
+    return supplier[:3].upper()
+
+def format_framecode(prefix, number):
+    return f"{prefix}{number:0{FRAMECODE_DIGITS}d}"
+
+def highest_framecode_number(prefix, framecodes):
+    """Largest 6-digit number used after `prefix` in `framecodes` (0 if none), as generate_framecode did."""
+    framecodes = pd.Series(framecodes, dtype=object).dropna().astype(str)
+    matching = framecodes[framecodes.str.startswith(prefix)]
+    nums = matching.str[len(prefix):].str.extract(r'(\d{6})')[0].dropna()
+    return int(nums.max()) if not nums.empty else 0
+
+def _read_counters(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+def _write_counters(path, counters):
+    directory, base = os.path.split(path)
+    fd, tmp_path = tempfile.mkstemp(prefix=base + ".", suffix=".tmp", dir=directory)
+    with os.fdopen(fd, "w") as f:
+        json.dump(counters, f, indent=1, sort_keys=True)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+def reserve_framecodes(prefix, count=1, framecodes=(), path=FRAMECODE_COUNTERS):
+    """Hand out `count` consecutive framecodes for `prefix`; no two callers ever get the same one.
+
+    `framecodes` (the inventory's FRAME NO. column) is only scanned the first time a prefix is seen.
+    """
+    with locked(path):
+        counters = _read_counters(path)
+        if prefix not in counters:
+            counters[prefix] = highest_framecode_number(prefix, framecodes)
+        first = counters[prefix] + 1
+        counters[prefix] += count
+        _write_counters(path, counters)
+    return [format_framecode(prefix, n) for n in range(first, first + count)]
+
+def observe_framecode(framecode, path=FRAMECODE_COUNTERS):
+    """Move counters past a framecode that was saved by hand (add or edit)."""
+    framecode = str(framecode)
+    with locked(path):
+        counters = _read_counters(path)
+        changed = False
+        for prefix, last in counters.items():
+            if framecode.startswith(prefix):
+                number = highest_framecode_number(prefix, [framecode])
+                if number > last:
+                    counters[prefix] = number
+                    changed = True
+        if changed:
+            _write_counters(path, counters)
+
+def observe_framecodes(framecodes, inventory_framecodes=(), path=FRAMECODE_COUNTERS):
+    """Move counters past a batch of saved framecodes (e.g. an import), in one write.
+
+    Unlike observe_framecode, prefixes without a counter yet are seeded too, from the batch and
+    `inventory_framecodes` together, so the next reservation cannot repeat any of them.
+    """
+    framecodes = pd.Series(framecodes, dtype=object).dropna().astype(str)
+    with locked(path):
+        counters = _read_counters(path)
+        changed = False
+        for prefix in framecodes.str[:3].unique():
+            highest = highest_framecode_number(prefix, framecodes)
+            if prefix not in counters:
+                counters[prefix] = max(highest, highest_framecode_number(prefix, inventory_framecodes))
+                changed = True
+            elif highest > counters[prefix]:
+                counters[prefix] = highest
+                changed = True
+        if changed:
+            _write_counters(path, counters)
+
+def reset_framecode_counters(path=FRAMECODE_COUNTERS):
+    """Forget all counters so they are re-seeded from the inventory, e.g. after an import."""
+    with locked(path):
+        if os.path.exists(path):
+            os.remove(path)
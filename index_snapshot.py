@@ -0,0 +1,142 @@
+import os
+import json
+import mmap
+import struct
+import tempfile
+import threading
+import time
+import numpy as np
+from file_lock import locked
+
+# On-disk barcode index shared by server workers through the page cache. Layout:
+#   magic | u64 header length | JSON header (columns, version, count, rows) | pad to 8
+#   u64 key offsets[count + 1] | u64 key rows[count] | u64 record offsets[rows + 1] | key bytes | record bytes
+# Keys are normalized barcodes sorted as UTF-8 bytes and key i is found in row key_rows[i];
+# records are every inventory row as JSON, in stored order, so pages can be served from it too.
+SNAPSHOT_MAGIC = b"BIDX0002"
+# Workers stat the snapshot at most this often (seconds) to notice a newly published one
+SNAPSHOT_CHECK_INTERVAL = float(os.environ.get("BARCODE_INDEX_CHECK_INTERVAL", "1"))
+
+def _pad8(n):
+    return (8 - n % 8) % 8
+
+def write_snapshot(path, keys, key_rows, records, columns, version, dumps=json.dumps):
+    """Publish a snapshot atomically (temp file + rename); readers keep their old mapping until they reopen.
+
+    `key_rows[i]` is the position in `records` of the row for `keys[i]`; `dumps` encodes each record,
+    so the server can use the same encoder it answers single-worker requests with.
+    """
+    order = sorted(range(len(keys)), key=lambda i: keys[i].encode("utf-8"))
+    key_bytes = [keys[i].encode("utf-8") for i in order]
+    record_bytes = [dumps(record).encode("utf-8") for record in records]
+    key_offsets = np.zeros(len(order) + 1, dtype="<u8")
+    record_offsets = np.zeros(len(records) + 1, dtype="<u8")
+    np.cumsum([len(k) for k in key_bytes], out=key_offsets[1:])
+    np.cumsum([len(r) for r in record_bytes], out=record_offsets[1:])
+    key_rows = np.asarray([key_rows[i] for i in order], dtype="<u8")
+    header = json.dumps({
+        "columns": list(columns), "version": version, "count": len(order), "rows": len(records),
+    }).encode("utf-8")
+    with locked(path):
+        directory = os.path.dirname(os.path.abspath(path))
+        fd, tmp_path = tempfile.mkstemp(prefix=os.path.basename(path) + ".", suffix=".tmp", dir=directory)
+        with os.fdopen(fd, "wb") as f:
+            f.write(SNAPSHOT_MAGIC + struct.pack("<Q", len(header)) + header)
+            f.write(b"\0" * _pad8(len(SNAPSHOT_MAGIC) + 8 + len(header)))
+            f.write(key_offsets.tobytes())
+            f.write(key_rows.tobytes())
+            f.write(record_offsets.tobytes())
+            f.write(b"".join(key_bytes))
+            f.write(b"".join(record_bytes))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+def read_snapshot_version(path):
+    try:
+        with open(path, "rb") as f:
+            if f.read(len(SNAPSHOT_MAGIC)) != SNAPSHOT_MAGIC:
+                return None
+            (length,) = struct.unpack("<Q", f.read(8))
+            return json.loads(f.read(length))["version"]
+    except (FileNotFoundError, ValueError, struct.error):
+        return None
+
+class IndexSnapshot:
+    """One published snapshot, memory-mapped read-only: lookups binary-search the keys, pages slice the records."""
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            self.stat_key = (os.fstat(f.fileno()).st_ino, os.fstat(f.fileno()).st_mtime_ns)
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mm[:len(SNAPSHOT_MAGIC)] != SNAPSHOT_MAGIC:
+            raise ValueError(f"{path} is not a barcode index snapshot.")
+        pos = len(SNAPSHOT_MAGIC)
+        (length,) = struct.unpack_from("<Q", self._mm, pos)
+        pos += 8
+        header = json.loads(self._mm[pos:pos + length])
+        pos += length + _pad8(pos + length)
+        self.columns = header["columns"]
+        self.version = header["version"]
+        count, rows = header["count"], header["rows"]
+        self._key_offsets = np.frombuffer(self._mm, dtype="<u8", count=count + 1, offset=pos)
+        pos += 8 * (count + 1)
+        self._key_rows = np.frombuffer(self._mm, dtype="<u8", count=count, offset=pos)
+        pos += 8 * count
+        self._record_offsets = np.frombuffer(self._mm, dtype="<u8", count=rows + 1, offset=pos)
+        pos += 8 * (rows + 1)
+        self._keys_start = pos
+        self._records_start = pos + int(self._key_offsets[-1])
+        self._count = count
+        self.rows = rows
+
+    def __len__(self):
+        return self._count
+
+    def _key(self, i):
+        start = self._keys_start
+        return self._mm[start + int(self._key_offsets[i]):start + int(self._key_offsets[i + 1])]
+
+    def find(self, key):
+        """Position of `key` (a normalized barcode), or None."""
+        target = key.encode("utf-8")
+        lo, hi = 0, self._count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._key(mid) < target:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo if lo < self._count and self._key(lo) == target else None
+
+    def record_bytes(self, i):
+        start = self._records_start
+        return self._mm[start + int(self._record_offsets[i]):start + int(self._record_offsets[i + 1])]
+
+    def get(self, key):
+        i = self.find(key)
+        return None if i is None else json.loads(self.record_bytes(int(self._key_rows[i])))
+
+    def page(self, start, stop):
+        """Records of rows start..stop-1, in stored order."""
+        return [json.loads(self.record_bytes(i)) for i in range(start, min(stop, self.rows))]
+
+class SnapshotReader:
+    """Per-process handle that swaps to a newly published snapshot without a restart."""
+
+    def __init__(self, path):
+        self.path = path
+        self._snapshot = None
+        self._checked = 0.0
+        self._lock = threading.Lock()
+
+    def current(self):
+        now = time.monotonic()
+        if self._snapshot is not None and now - self._checked < SNAPSHOT_CHECK_INTERVAL:
+            return self._snapshot
+        with self._lock:
+            stat = os.stat(self.path)
+            if self._snapshot is None or self._snapshot.stat_key != (stat.st_ino, stat.st_mtime_ns):
+                self._snapshot = IndexSnapshot(self.path)
+            self._checked = now
+            return self._snapshot
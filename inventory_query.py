@@ -0,0 +1,146 @@
+import threading
+import numpy as np
+import pandas as pd
+from inventory_storage import DERIVED_COLUMNS, strip_derived_columns
+
+PAGE_SIZE_DEFAULT = 50
+PAGE_SIZES = [25, 50, 100, 250]
+# Columns with more distinct values than this are sortable but not offered as value filters
+FILTER_MAX_VALUES = 500
+
+class TableView:
+    """Filter / sort / page queries over one table, served from per-version indexes.
+
+    Sort orders (positions) and value -> positions maps are computed the first time a column
+    is sorted or filtered on and kept until the inventory version changes, so a page request
+    is an index lookup plus a slice instead of a sort over the whole frame.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        self._df = None
+        self._orders = {}
+        self._values = {}
+        self._filterable = None
+
+    def sync(self, version, df):
+        with self._lock:
+            if self._version != version:
+                self._version = version
+                self._df = df
+                self._orders = {}
+                self._values = {}
+                self._filterable = None
+
+    @property
+    def columns(self):
+        return [c for c in self._df.columns if c not in DERIVED_COLUMNS]
+
+    def __len__(self):
+        return len(self._df)
+
+    def sort_order(self, column, ascending=True):
+        """Row positions in `column` order (stable, blanks last)."""
+        key = (column, ascending)
+        order = self._orders.get(key)
+        if order is None:
+            values = self._df[column].reset_index(drop=True)
+            try:
+                ordered = values.sort_values(ascending=ascending, kind="stable", na_position="last")
+            except TypeError:
+                # Mixed numbers and text (hand-typed columns): order by the text shown in the table
+                ordered = values.where(values.isna(), values.astype(str)).sort_values(
+                    ascending=ascending, kind="stable", na_position="last"
+                )
+            order = ordered.index.to_numpy()
+            with self._lock:
+                self._orders[key] = order
+        return order
+
+    def value_positions(self, column):
+        """Shown value (as text) -> row positions holding it."""
+        positions = self._values.get(column)
+        if positions is None:
+            values = self._df[column]
+            shown = values.astype(str).where(values.notna()).to_numpy()
+            positions = dict(pd.Series(np.arange(len(shown))).groupby(shown, sort=False).indices)
+            with self._lock:
+                self._values[column] = positions
+        return positions
+
+    def filterable_columns(self):
+        if self._filterable is None:
+            self._filterable = [c for c in self.columns if self._df[c].nunique() <= FILTER_MAX_VALUES]
+        return self._filterable
+
+    def value_options(self, column):
+        return sorted(self.value_positions(column))
+
+    def matching(self, filters=None, sort=None, ascending=True):
+        """Positions of the rows matching every filter ({column: [shown values]}), in sort order.
+
+        None means every row in stored order, which needs no array at all.
+        """
+        n = len(self._df)
+        keep = None
+        for column, values in (filters or {}).items():
+            if not values:
+                continue
+            index = self.value_positions(column)
+            mask = np.zeros(n, dtype=bool)
+            for value in values:
+                positions = index.get(str(value))
+                if positions is not None:
+                    mask[positions] = True
+            keep = mask if keep is None else keep & mask
+        order = self.sort_order(sort, ascending) if sort else None
+        if keep is not None:
+            order = order[keep[order]] if order is not None else np.flatnonzero(keep)
+        return order
+
+    def page(self, order, offset=0, limit=PAGE_SIZE_DEFAULT):
+        if order is None:
+            return self._df.iloc[offset:offset + limit]
+        return self._df.iloc[order[offset:offset + limit]]
+
+    def query(self, filters=None, sort=None, ascending=True, offset=0, limit=PAGE_SIZE_DEFAULT):
+        """One page of matching rows plus the number of rows matching."""
+        order = self.matching(filters, sort, ascending)
+        return self.page(order, offset, limit), len(self) if order is None else len(order)
+
+_views = {}
+_views_lock = threading.Lock()
+
+def get_table_view(table):
+    """Process-wide query view of `table`, in step with its current inventory version."""
+    with _views_lock:
+        view = _views.setdefault(table.name, TableView())
+    view.sync(table.version(), table.load_cached())
+    return view
+
+def show_table_page(table, key, page_size=PAGE_SIZE_DEFAULT):
+    """Filter, sort and page controls plus a dataframe holding only the requested page; returns that page."""
+    import streamlit as st
+    view = get_table_view(table)
+    controls = st.columns(5)
+    filter_column = controls[0].selectbox("Filter by", ["(none)"] + view.filterable_columns(), key=f"{key}_filter_column")
+    filter_values = []
+    if filter_column != "(none)":
+        filter_values = controls[1].multiselect(
+            "Values", view.value_options(filter_column), key=f"{key}_filter_values_{filter_column}"
+        )
+    sort_column = controls[2].selectbox("Sort by", ["(stored order)"] + view.columns, key=f"{key}_sort")
+    descending = controls[3].checkbox("Descending", key=f"{key}_descending")
+    page_size = controls[4].selectbox("Rows per page", PAGE_SIZES, index=PAGE_SIZES.index(page_size), key=f"{key}_page_size")
+    filters = {filter_column: filter_values} if filter_values else None
+    sort = None if sort_column == "(stored order)" else sort_column
+    order = view.matching(filters, sort, not descending)
+    total = len(view) if order is None else len(order)
+    pages = max((total + page_size - 1) // page_size, 1)
+    page = min(int(st.number_input("Page", min_value=1, value=1, step=1, key=f"{key}_page")), pages)
+    rows = view.page(order, (page - 1) * page_size, page_size)
+    st.dataframe(strip_derived_columns(rows), use_container_width=True)
+    first = (page - 1) * page_size + 1 if total else 0
+    st.caption(f"Rows {first}-{first + len(rows) - 1 if total else 0} of {total} · page {page} of {pages}")
+    return rows
@@ -0,0 +1,851 @@
+import os
+import json
+import time
+import logging
+import sqlite3
+import argparse
+import tempfile
+import threading
+from contextlib import contextmanager
+from datetime import date, datetime
+import numpy as np
+import openpyxl
+import pandas as pd
+from file_lock import locked
+from change_notify import get_watcher, read_sequence, bump_sequence
+from workbook_cache import read_workbook
+from barcode_utils import clean_barcode, clean_barcode_series
+
+logger = logging.getLogger(__name__)
+
+# Paths (inventory files live next to this module unless INVENTORY_DATA_DIR points elsewhere)
+APP_DIR = os.environ.get("INVENTORY_DATA_DIR") or os.path.dirname(os.path.abspath(__file__))
+MAIN_INVENTORY = os.path.join(APP_DIR, "inventory.xlsx")
+SECONDARY_INVENTORY = os.path.join(APP_DIR, "secondary_inventory.xlsx")
+UNFOUND_BARCODES = os.path.join(APP_DIR, "unfound_barcodes.xlsx")
+SQLITE_DATABASE = os.path.join(APP_DIR, "inventory.db")
+# Per-table write counters, bumped after every write so other processes' watchers wake up
+INVENTORY_SEQUENCE = os.path.join(APP_DIR, "inventory.seq")
+
+# "excel" keeps the xlsx files as the live store, "journal" keeps them as the source of truth
+# but appends mutations to a journal first, "sqlite" uses them only for import/export
+STORAGE_BACKEND = os.environ.get("INVENTORY_BACKEND", "excel").lower()
+# Seconds between background folds of the journal into the xlsx snapshot
+JOURNAL_COMPACT_INTERVAL = float(os.environ.get("INVENTORY_COMPACT_INTERVAL", "10"))
+JOURNAL_SEQ_PREFIX = "journal-seq="
+
+BARCODE_COLUMN = "BARCODE"
+FRAMECODE_COLUMN = "FRAME NO."
+# Normalized key columns attached by load_cached(); never written back to storage
+DERIVED_COLUMNS = ["BARCODE_CLEAN", "FRAME_CLEAN"]
+UNFOUND_COLUMNS = ["BARCODE", "Timestamp"]
+# Stamped by the app on every save; an unchanged stamp means an unchanged row
+ROW_STAMP_COLUMN = "Timestamp"
+
+TABLES = {
+    "main": (MAIN_INVENTORY, None),
+    "secondary": (SECONDARY_INVENTORY, None),
+    "unfound": (UNFOUND_BARCODES, UNFOUND_COLUMNS),
+}
+
+def add_derived_columns(df):
+    if BARCODE_COLUMN in df.columns:
+        df["BARCODE_CLEAN"] = clean_barcode_series(df[BARCODE_COLUMN])
+    if FRAMECODE_COLUMN in df.columns:
+        df["FRAME_CLEAN"] = clean_barcode_series(df[FRAMECODE_COLUMN])
+    return df
+
+def strip_derived_columns(df):
+    return df.drop(columns=DERIVED_COLUMNS, errors="ignore")
+
+class RowConflict(Exception):
+    """An edited row was changed or removed by someone else since the editor read it."""
+
+    def __init__(self, row_id, columns=()):
+        self.row_id = row_id
+        self.columns = list(columns)
+        if self.columns:
+            message = f"Row {row_id} was changed by someone else ({', '.join(self.columns)})."
+        else:
+            message = f"Row {row_id} was removed or re-keyed by someone else."
+        super().__init__(message)
+
+def _comparable(val):
+    # Compare the way the form shows values: blank == NaN, 80 == 80.0 == "80", a midnight datetime == its date
+    if isinstance(val, (datetime, date)) and not pd.isnull(val):
+        text = val.isoformat(sep=" ") if isinstance(val, datetime) else val.isoformat()
+        return text[:-9] if text.endswith(" 00:00:00") else text
+    return clean_barcode(val)
+
+def _same_value(a, b):
+    return _comparable(a) == _comparable(b)
+
+def _locate_row(df, row_id, base):
+    """The row `base` was read from: `row_id` if it still holds the same barcode, else the row that does."""
+    key = clean_barcode(base.get(BARCODE_COLUMN))
+    if row_id in df.index and clean_barcode(df.at[row_id, BARCODE_COLUMN]) == key:
+        return row_id
+    matches = df.index[df["BARCODE_CLEAN"] == key] if key else []
+    if len(matches) != 1:
+        raise RowConflict(row_id)
+    return matches[0]
+
+def _replace_workbook(path, df, keywords=None):
+    """Write `df` to a temp workbook and rename it over `path`, so readers never see a half-written file."""
+    directory, base = os.path.split(path)
+    fd, tmp_path = tempfile.mkstemp(prefix=base + ".", suffix=".tmp.xlsx", dir=directory)
+    os.close(fd)
+    try:
+        with pd.ExcelWriter(tmp_path, engine="openpyxl") as writer:
+            df.to_excel(writer, index=False)
+            if keywords is not None:
+                writer.book.properties.keywords = keywords
+        with open(tmp_path, "rb") as f:
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+class InventoryTable:
+    """Row-level access to one inventory table. Row ids are the frame's index labels."""
+
+    # False when a delete or prepend renumbers the rows after it (ids are positions)
+    stable_row_ids = False
+
+    def __init__(self, name, excel_path, default_columns=None):
+        self.name = name
+        self.excel_path = excel_path
+        self.default_columns = default_columns
+        self._cached = None
+        self._cache_lock = threading.Lock()
+        self._watcher = None
+        self._writes = 0
+        self._version_cache = None
+
+    def watch(self, watcher):
+        """Let `watcher` tell this table when to re-read its version instead of checking every call."""
+        if watcher is not None:
+            watcher.watch(self.watch_paths() + [INVENTORY_SEQUENCE])
+        self._watcher = watcher
+
+    def watch_paths(self):
+        return [self.excel_path]
+
+    def version(self):
+        """Write counter plus store stat; only re-read after a change was observed (or a write here)."""
+        watcher = self._watcher
+        if watcher is None or not watcher.is_active():
+            return self._read_version()
+        # Read the generation before the store so a change in between is picked up next call
+        generation = (watcher.generation, self._writes)
+        cached = self._version_cache
+        if cached is not None and cached[0] == generation:
+            return cached[1]
+        version = self._read_version()
+        self._version_cache = (generation, version)
+        return version
+
+    def _read_version(self):
+        store = self._store_version()
+        if store is None:
+            return None
+        return (read_sequence(INVENTORY_SEQUENCE).get(self.name, 0), store)
+
+    def _changed(self):
+        self._writes += 1
+        bump_sequence(INVENTORY_SEQUENCE, self.name)
+
+    def write_lock(self):
+        """Advisory lock held around every read-modify-write of this table's store."""
+        return locked(self.excel_path)
+
+    @contextmanager
+    def transaction(self):
+        """Hold the write lock and yield (frame, version) re-read from the store itself, not the watcher.
+
+        Checks made against the frame stay true for writes made inside the block, and version()
+        read inside the block is exactly the version those writes produced. Re-entrant.
+        """
+        with self.write_lock():
+            self._version_cache = None
+            yield self.load_cached(), self.version()
+
+    def merge_update(self, row_id, values, base):
+        """Save an edit made against `base` (the row as the editor read it), merging with others' edits.
+
+        Only fields whose value differs from `base` are written, so fields someone else changed
+        meanwhile survive. A field both sides changed to different values raises RowConflict and
+        nothing is written. Returns (row id written, changes written).
+        """
+        with self.transaction() as (df, _):
+            row_id = _locate_row(df, row_id, base)
+            current = df.loc[row_id]
+            stamp = ROW_STAMP_COLUMN
+            untouched = stamp in current.index and not pd.isnull(current[stamp]) and _same_value(current[stamp], base.get(stamp))
+            changes = {c: v for c, v in values.items() if c == stamp or not _same_value(v, base.get(c))}
+            if not untouched:
+                conflicts = [
+                    c for c, v in changes.items()
+                    if c != stamp and c in current.index
+                    and not _same_value(current[c], base.get(c)) and not _same_value(current[c], v)
+                ]
+                if conflicts:
+                    raise RowConflict(row_id, conflicts)
+            if any(c != stamp for c in changes):
+                self.update(row_id, changes)
+            else:
+                changes = {}
+            return row_id, changes
+
+    def checked_delete(self, row_id, base):
+        """Delete the row `base` was read from, unless someone else changed it meanwhile; returns its id."""
+        with self.transaction() as (df, _):
+            row_id = _locate_row(df, row_id, base)
+            changed = [
+                c for c in df.columns
+                if c not in DERIVED_COLUMNS and not _same_value(df.at[row_id, c], base.get(c))
+            ]
+            if changed:
+                raise RowConflict(row_id, changed)
+            self.delete(row_id)
+            return row_id
+
+    def load_cached(self):
+        """Parsed table plus normalized key columns, shared by every session until the store changes.
+
+        The returned frame is shared: treat it as read-only and copy before mutating.
+        """
+        version = self.version()
+        cached = self._cached
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        with self._cache_lock:
+            cached = self._cached
+            if cached is not None and cached[0] == version:
+                return cached[1]
+            df = add_derived_columns(self.load())
+            self._cached = (version, df)
+            return df
+
+    def exists(self):
+        raise NotImplementedError
+
+    def ensure(self, columns=None):
+        raise NotImplementedError
+
+    def _store_version(self):
+        raise NotImplementedError
+
+    def load(self):
+        raise NotImplementedError
+
+    def insert(self, row, prepend=False):
+        raise NotImplementedError
+
+    def update(self, row_id, values):
+        raise NotImplementedError
+
+    def delete(self, row_id):
+        raise NotImplementedError
+
+    def delete_barcode(self, barcode_clean):
+        raise NotImplementedError
+
+    def insert_many(self, rows, prepend=False):
+        """Insert several rows in one write (prepended as a block, in the given order); returns their ids."""
+        raise NotImplementedError
+
+    def delete_barcodes(self, barcodes_clean):
+        """Delete every row whose normalized barcode is in `barcodes_clean`, in one write; returns the count."""
+        raise NotImplementedError
+
+    def replace(self, df):
+        raise NotImplementedError
+
+    def lookup_barcode(self, barcode_clean):
+        df = self.load_cached()
+        if "BARCODE_CLEAN" not in df.columns:
+            return strip_derived_columns(df.iloc[0:0])
+        return strip_derived_columns(df[df["BARCODE_CLEAN"] == barcode_clean])
+
+    def import_excel(self, source):
+        self.replace(strip_derived_columns(pd.read_excel(source)))
+
+    def export_excel(self, target):
+        self.load().to_excel(target, index=False)
+
+class ExcelTable(InventoryTable):
+    """The original storage: every mutation rewrites the whole workbook."""
+
+    def exists(self):
+        return os.path.exists(self.excel_path)
+
+    def ensure(self, columns=None):
+        with self.write_lock():
+            if not self.exists():
+                columns = columns if columns is not None else self.default_columns
+                self._write(pd.DataFrame(columns=columns))
+
+    def _store_version(self):
+        try:
+            stat = os.stat(self.excel_path)
+        except FileNotFoundError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def load(self):
+        if not self.exists():
+            raise FileNotFoundError(self.excel_path)
+        return read_workbook(self.excel_path)
+
+    def _current(self):
+        # Callers hold the write lock; re-check the store so another process's save is not overwritten
+        self._version_cache = None
+        return strip_derived_columns(self.load_cached()).copy()
+
+    def _write(self, df):
+        _replace_workbook(self.excel_path, strip_derived_columns(df))
+        self._changed()
+
+    def insert(self, row, prepend=False):
+        with self.write_lock():
+            df = self._current()
+            new_df = pd.DataFrame([row])
+            df = pd.concat([new_df, df] if prepend else [df, new_df], ignore_index=True)
+            self._write(df)
+            return 0 if prepend else len(df) - 1
+
+    def update(self, row_id, values):
+        with self.write_lock():
+            df = self._current()
+            for col, val in values.items():
+                if col in df.columns and df[col].dtype != object:
+                    df[col] = df[col].astype(object)
+                df.at[row_id, col] = val
+            self._write(df)
+
+    def delete(self, row_id):
+        with self.write_lock():
+            df = self._current()
+            self._write(df.drop(row_id).reset_index(drop=True))
+
+    def delete_barcode(self, barcode_clean):
+        with self.write_lock():
+            self._version_cache = None
+            df = self.load_cached()
+            keep = df["BARCODE_CLEAN"] != barcode_clean
+            if keep.all():
+                return 0
+            self._write(df[keep])
+            return int((~keep).sum())
+
+    def insert_many(self, rows, prepend=False):
+        if not rows:
+            return []
+        with self.write_lock():
+            df = self._current()
+            new_df = pd.DataFrame(rows)
+            df = pd.concat([new_df, df] if prepend else [df, new_df], ignore_index=True)
+            self._write(df)
+            start = 0 if prepend else len(df) - len(rows)
+            return list(range(start, start + len(rows)))
+
+    def delete_barcodes(self, barcodes_clean):
+        barcodes_clean = set(barcodes_clean)
+        if not barcodes_clean:
+            return 0
+        with self.write_lock():
+            self._version_cache = None
+            df = self.load_cached()
+            keep = ~df["BARCODE_CLEAN"].isin(barcodes_clean)
+            if keep.all():
+                return 0
+            self._write(df[keep])
+            return int((~keep).sum())
+
+    def replace(self, df):
+        with self.write_lock():
+            self._write(df)
+
+def _quote(name):
+    return '"' + str(name).replace('"', '""') + '"'
+
+def _plain_value(val):
+    if val is None:
+        return None
+    if isinstance(val, np.generic):
+        val = val.item()
+    if isinstance(val, (datetime, date)):
+        return None if pd.isnull(val) else str(val)
+    if isinstance(val, float) and np.isnan(val):
+        return None
+    if not isinstance(val, (str, int, float, bytes)):
+        return None if pd.isnull(val) else str(val)
+    return val
+
+class SqliteTable(InventoryTable):
+    """Indexed SQLite storage; the xlsx file only seeds the table on first use."""
+
+    stable_row_ids = True
+
+    def __init__(self, name, excel_path, default_columns=None, db_path=SQLITE_DATABASE):
+        super().__init__(name, excel_path, default_columns)
+        self.db_path = db_path
+        self._table = _quote(name)
+        self._schema_lock = threading.Lock()
+        self._schema_ready = False
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            yield conn
+            conn.commit()
+        finally:
+            conn.close()
+
+    def _table_exists(self, conn):
+        cur = conn.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (self.name,))
+        return cur.fetchone() is not None
+
+    def _columns(self, conn):
+        return [r[1] for r in conn.execute(f"PRAGMA table_info({self._table})") if r[1] != "_barcode_clean"]
+
+    def _create(self, conn, df):
+        conn.execute(f"DROP TABLE IF EXISTS {self._table}")
+        cols = ", ".join([_quote(c) for c in df.columns] + ["_barcode_clean"])
+        conn.execute(f"CREATE TABLE {self._table} ({cols})")
+        conn.execute(f"CREATE INDEX {_quote('idx_' + self.name + '_barcode')} ON {self._table} (_barcode_clean)")
+        if len(df):
+            barcodes = clean_barcode_series(df[BARCODE_COLUMN]) if BARCODE_COLUMN in df.columns else [""] * len(df)
+            placeholders = ", ".join(["?"] * (len(df.columns) + 1))
+            rows = (
+                [_plain_value(v) for v in values] + [key]
+                for values, key in zip(df.itertuples(index=False, name=None), barcodes)
+            )
+            conn.executemany(f"INSERT INTO {self._table} VALUES ({placeholders})", rows)
+        self._schema_ready = True
+
+    def _ensure_schema(self, conn, columns=None):
+        if self._schema_ready and self._table_exists(conn):
+            return True
+        with self._schema_lock:
+            if self._table_exists(conn):
+                self._schema_ready = True
+            elif os.path.exists(self.excel_path):
+                self._create(conn, pd.read_excel(self.excel_path))
+            elif columns is not None or self.default_columns is not None:
+                self._create(conn, pd.DataFrame(columns=columns if columns is not None else self.default_columns))
+        return self._schema_ready
+
+    def _add_missing_columns(self, conn, names):
+        existing = set(self._columns(conn))
+        for name in names:
+            if name not in existing:
+                conn.execute(f"ALTER TABLE {self._table} ADD COLUMN {_quote(name)}")
+
+    def exists(self):
+        with self._connect() as conn:
+            return self._ensure_schema(conn)
+
+    def ensure(self, columns=None):
+        with self._connect() as conn:
+            self._ensure_schema(conn, columns)
+
+    def watch_paths(self):
+        return [self.db_path]
+
+    def write_lock(self):
+        return locked(self.db_path)
+
+    def _store_version(self):
+        try:
+            stat = os.stat(self.db_path)
+        except FileNotFoundError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def _select(self, conn, where="", params=()):
+        df = pd.read_sql_query(
+            f'SELECT rowid AS "__rowid__", * FROM {self._table} {where} ORDER BY rowid',
+            conn, params=params, index_col="__rowid__",
+        )
+        df = df.drop(columns=["_barcode_clean"])
+        df.index.name = None
+        return df
+
+    def load(self):
+        with self._connect() as conn:
+            if not self._ensure_schema(conn):
+                raise FileNotFoundError(self.excel_path)
+            return self._select(conn)
+
+    def lookup_barcode(self, barcode_clean):
+        with self._connect() as conn:
+            if not self._ensure_schema(conn):
+                raise FileNotFoundError(self.excel_path)
+            return self._select(conn, "WHERE _barcode_clean = ?", (barcode_clean,))
+
+    def insert(self, row, prepend=False):
+        with self.write_lock(), self._connect() as conn:
+            self._ensure_schema(conn, list(row))
+            self._add_missing_columns(conn, row)
+            names = list(row)
+            values = [_plain_value(row[name]) for name in names]
+            cols = [_quote(n) for n in names] + ["_barcode_clean"]
+            values.append(clean_barcode(row.get(BARCODE_COLUMN)))
+            if prepend:
+                row_id = conn.execute(f"SELECT COALESCE(MIN(rowid), 1) - 1 FROM {self._table}").fetchone()[0]
+                cols.insert(0, "rowid")
+                values.insert(0, row_id)
+            placeholders = ", ".join(["?"] * len(values))
+            row_id = conn.execute(f"INSERT INTO {self._table} ({', '.join(cols)}) VALUES ({placeholders})", values).lastrowid
+        self._changed()
+        return row_id
+
+    def update(self, row_id, values):
+        if not values:
+            return
+        with self.write_lock(), self._connect() as conn:
+            self._ensure_schema(conn)
+            self._add_missing_columns(conn, values)
+            assignments = [f"{_quote(name)} = ?" for name in values]
+            params = [_plain_value(v) for v in values.values()]
+            if BARCODE_COLUMN in values:
+                assignments.append("_barcode_clean = ?")
+                params.append(clean_barcode(values[BARCODE_COLUMN]))
+            params.append(int(row_id))
+            conn.execute(f"UPDATE {self._table} SET {', '.join(assignments)} WHERE rowid = ?", params)
+        self._changed()
+
+    def delete(self, row_id):
+        with self.write_lock(), self._connect() as conn:
+            self._ensure_schema(conn)
+            conn.execute(f"DELETE FROM {self._table} WHERE rowid = ?", (int(row_id),))
+        self._changed()
+
+    def delete_barcode(self, barcode_clean):
+        with self.write_lock(), self._connect() as conn:
+            self._ensure_schema(conn)
+            count = conn.execute(f"DELETE FROM {self._table} WHERE _barcode_clean = ?", (barcode_clean,)).rowcount
+        if count:
+            self._changed()
+        return count
+
+    def insert_many(self, rows, prepend=False):
+        if not rows:
+            return []
+        with self.write_lock(), self._connect() as conn:
+            names = list(dict.fromkeys(name for row in rows for name in row))
+            self._ensure_schema(conn, names)
+            self._add_missing_columns(conn, names)
+            if prepend:
+                first = conn.execute(f"SELECT COALESCE(MIN(rowid), 1) FROM {self._table}").fetchone()[0] - len(rows)
+            else:
+                first = conn.execute(f"SELECT COALESCE(MAX(rowid), 0) + 1 FROM {self._table}").fetchone()[0]
+            row_ids = list(range(first, first + len(rows)))
+            cols = ["rowid"] + [_quote(n) for n in names] + ["_barcode_clean"]
+            placeholders = ", ".join(["?"] * len(cols))
+            conn.executemany(
+                f"INSERT INTO {self._table} ({', '.join(cols)}) VALUES ({placeholders})",
+                (
+                    [row_id] + [_plain_value(row.get(name)) for name in names] + [clean_barcode(row.get(BARCODE_COLUMN))]
+                    for row_id, row in zip(row_ids, rows)
+                ),
+            )
+        self._changed()
+        return row_ids
+
+    def delete_barcodes(self, barcodes_clean):
+        barcodes_clean = set(barcodes_clean)
+        if not barcodes_clean:
+            return 0
+        with self.write_lock(), self._connect() as conn:
+            self._ensure_schema(conn)
+            before = conn.total_changes
+            conn.executemany(f"DELETE FROM {self._table} WHERE _barcode_clean = ?", ((b,) for b in barcodes_clean))
+            count = conn.total_changes - before
+        if count:
+            self._changed()
+        return count
+
+    def replace(self, df):
+        with self.write_lock(), self._connect() as conn:
+            with self._schema_lock:
+                self._create(conn, df)
+        self._changed()
+
+def _stat_key(path):
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+def _read_snapshot_seq(path):
+    wb = openpyxl.load_workbook(path, read_only=True)
+    try:
+        keywords = wb.properties.keywords or ""
+    finally:
+        wb.close()
+    for part in keywords.split():
+        if part.startswith(JOURNAL_SEQ_PREFIX):
+            return int(part[len(JOURNAL_SEQ_PREFIX):])
+    return 0
+
+def _apply_entry(df, entry):
+    op = entry["op"]
+    if op == "insert":
+        new_row = pd.DataFrame([entry["row"]], index=[entry["row_id"]])
+        return pd.concat([new_row, df] if entry.get("prepend") else [df, new_row])
+    if op == "update":
+        if entry["row_id"] not in df.index:
+            return df
+        for col, val in entry["values"].items():
+            if col in df.columns and df[col].dtype != object:
+                df[col] = df[col].astype(object)
+            df.loc[entry["row_id"], col] = val
+        return df
+    if op == "delete":
+        return df.drop(index=entry["row_id"], errors="ignore")
+    if op == "delete_barcode":
+        return df[clean_barcode_series(df[BARCODE_COLUMN]) != entry["barcode"]]
+    if op == "insert_many":
+        new_rows = pd.DataFrame(entry["rows"], index=entry["row_ids"])
+        return pd.concat([new_rows, df] if entry.get("prepend") else [df, new_rows])
+    if op == "delete_barcodes":
+        return df[~clean_barcode_series(df[BARCODE_COLUMN]).isin(set(entry["barcodes"]))]
+    raise ValueError(f"Unknown journal operation '{op}'")
+
+# One compactor thread per journal per process, however many table instances share the journal
+_compactors = {}
+_compactors_lock = threading.Lock()
+
+def _start_compactor(table):
+    key = os.path.abspath(table.journal_path)
+    with _compactors_lock:
+        if key in _compactors:
+            return
+        thread = threading.Thread(target=table._compact_loop, name=f"journal-compactor-{table.name}", daemon=True)
+        _compactors[key] = thread
+    thread.start()
+
+class JournalTable(ExcelTable):
+    """xlsx snapshot plus an append-only, fsync'd journal of row mutations.
+
+    Readers replay the journal on top of the snapshot; a background thread (one per
+    journal per process) folds the journal into a fresh snapshot (temp file + atomic rename). The snapshot
+    records the last folded sequence number in its keywords property, so a crash
+    between the rename and the journal truncation never replays an entry twice.
+    """
+
+    # Ids only change when a compaction rewrites the snapshot, which is a new version
+    stable_row_ids = True
+
+    def __init__(self, name, excel_path, default_columns=None):
+        super().__init__(name, excel_path, default_columns)
+        self.journal_path = excel_path + ".journal"
+        self._lock = threading.RLock()
+        self._snapshot_key = None
+        self._frame = None
+        self._seq = 0
+        self._offset = 0
+        _start_compactor(self)
+
+    def watch_paths(self):
+        return [self.excel_path, self.journal_path]
+
+    @contextmanager
+    def write_lock(self):
+        # Same order as _append: thread lock first, then the journal's file lock
+        with self._lock, locked(self.journal_path):
+            yield
+
+    def _store_version(self):
+        return (_stat_key(self.excel_path), _stat_key(self.journal_path))
+
+    def _journal_size(self):
+        journal_key = _stat_key(self.journal_path)
+        return journal_key[1] if journal_key else 0
+
+    def _refresh(self):
+        snapshot_key = _stat_key(self.excel_path)
+        if snapshot_key is None:
+            raise FileNotFoundError(self.excel_path)
+        journal_size = self._journal_size()
+        if snapshot_key != self._snapshot_key or journal_size < self._offset:
+            self._frame = read_workbook(self.excel_path)
+            self._seq = _read_snapshot_seq(self.excel_path)
+            self._snapshot_key = snapshot_key
+            self._offset = 0
+        if journal_size > self._offset:
+            self._replay_tail()
+
+    def _replay_tail(self):
+        with open(self.journal_path, "rb") as f:
+            f.seek(self._offset)
+            data = f.read()
+        # A trailing line without a newline is a torn write; leave it for the next append to close off
+        end = data.rfind(b"\n") + 1
+        for line in data[:end].splitlines():
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            if entry.get("seq", 0) <= self._seq:
+                continue
+            self._frame = _apply_entry(self._frame, entry)
+            self._seq = entry["seq"]
+        self._offset += end
+
+    def load(self):
+        with self._lock:
+            self._refresh()
+            return self._frame.copy()
+
+    def _append(self, entry):
+        with self._lock, locked(self.journal_path):
+            self._refresh()
+            entry["seq"] = self._seq + 1
+            line = (json.dumps(entry) + "\n").encode("utf-8")
+            with open(self.journal_path, "a+b") as f:
+                f.seek(0, os.SEEK_END)
+                if f.tell() > 0:
+                    f.seek(-1, os.SEEK_END)
+                    if f.read(1) != b"\n":
+                        f.write(b"\n")
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+                self._offset = f.tell()
+            self._frame = _apply_entry(self._frame, entry)
+            self._seq = entry["seq"]
+        self._changed()
+        return entry
+
+    def insert(self, row, prepend=False):
+        with self.write_lock():
+            self._refresh()
+            if len(self._frame.index):
+                row_id = int(self._frame.index.min()) - 1 if prepend else int(self._frame.index.max()) + 1
+            else:
+                row_id = 0
+            row = {str(k): _plain_value(v) for k, v in row.items()}
+            self._append({"op": "insert", "row_id": row_id, "row": row, "prepend": prepend})
+            return row_id
+
+    def update(self, row_id, values):
+        with self.write_lock():
+            self._refresh()
+            if row_id not in self._frame.index:
+                raise KeyError(row_id)
+            values = {str(k): _plain_value(v) for k, v in values.items()}
+            self._append({"op": "update", "row_id": int(row_id), "values": values})
+
+    def delete(self, row_id):
+        self._append({"op": "delete", "row_id": int(row_id)})
+
+    def delete_barcode(self, barcode_clean):
+        with self.write_lock():
+            self._refresh()
+            count = int((clean_barcode_series(self._frame[BARCODE_COLUMN]) == barcode_clean).sum())
+            if count:
+                self._append({"op": "delete_barcode", "barcode": barcode_clean})
+            return count
+
+    def insert_many(self, rows, prepend=False):
+        if not rows:
+            return []
+        with self.write_lock():
+            self._refresh()
+            if len(self._frame.index):
+                first = int(self._frame.index.min()) - len(rows) if prepend else int(self._frame.index.max()) + 1
+            else:
+                first = 0
+            row_ids = list(range(first, first + len(rows)))
+            rows = [{str(k): _plain_value(v) for k, v in row.items()} for row in rows]
+            self._append({"op": "insert_many", "row_ids": row_ids, "rows": rows, "prepend": prepend})
+            return row_ids
+
+    def delete_barcodes(self, barcodes_clean):
+        barcodes_clean = set(barcodes_clean)
+        with self.write_lock():
+            self._refresh()
+            count = int(clean_barcode_series(self._frame[BARCODE_COLUMN]).isin(barcodes_clean).sum()) if barcodes_clean else 0
+            if count:
+                self._append({"op": "delete_barcodes", "barcodes": sorted(barcodes_clean)})
+            return count
+
+    def _write_snapshot(self, df, seq):
+        _replace_workbook(self.excel_path, df, keywords=f"{JOURNAL_SEQ_PREFIX}{seq}")
+
+    def _truncate_journal(self):
+        with open(self.journal_path, "wb") as f:
+            os.fsync(f.fileno())
+        self._snapshot_key = _stat_key(self.excel_path)
+        self._offset = 0
+
+    def compact(self):
+        with self._lock, locked(self.journal_path):
+            if not os.path.exists(self.excel_path) or self._journal_size() == 0:
+                return False
+            self._refresh()
+            self._write_snapshot(self._frame, self._seq)
+            # Other processes number the new snapshot's rows from 0; match them
+            self._frame = self._frame.reset_index(drop=True)
+            self._truncate_journal()
+        self._changed()
+        return True
+
+    def replace(self, df):
+        with self._lock, locked(self.journal_path):
+            if os.path.exists(self.excel_path):
+                self._refresh()
+            self._write_snapshot(df, self._seq)
+            self._frame = df.reset_index(drop=True)
+            self._truncate_journal()
+        self._changed()
+
+    def _compact_loop(self):
+        while True:
+            time.sleep(JOURNAL_COMPACT_INTERVAL)
+            try:
+                self.compact()
+            except Exception:
+                logger.exception("Journal compaction failed for %s", self.excel_path)
+
+BACKENDS = {
+    "excel": ExcelTable,
+    "journal": JournalTable,
+    "sqlite": SqliteTable,
+}
+
+_tables = {}
+_tables_lock = threading.Lock()
+
+def get_table(name, backend=None):
+    backend = backend or STORAGE_BACKEND
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown inventory backend '{backend}'. Choose from: {', '.join(BACKENDS)}")
+    with _tables_lock:
+        if (backend, name) not in _tables:
+            excel_path, default_columns = TABLES[name]
+            table = BACKENDS[backend](name, excel_path, default_columns)
+            table.watch(get_watcher())
+            _tables[(backend, name)] = table
+        return _tables[(backend, name)]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Import or export inventory tables as Excel workbooks.")
+    parser.add_argument("action", choices=["import", "export"])
+    parser.add_argument("table", choices=list(TABLES))
+    parser.add_argument("path", help="xlsx file to read from (import) or write to (export)")
+    parser.add_argument("--backend", default=None, choices=list(BACKENDS))
+    args = parser.parse_args()
+    table = get_table(args.table, args.backend)
+    if args.action == "import":
+        table.import_excel(args.path)
+    else:
+        table.export_excel(args.path)
@@ -0,0 +1,151 @@
+import threading
+from barcode_utils import clean_barcode
+from inventory_storage import BARCODE_COLUMN, FRAMECODE_COLUMN
+
+# Key column -> its normalized column from load_cached()
+KEY_COLUMNS = {BARCODE_COLUMN: "BARCODE_CLEAN", FRAMECODE_COLUMN: "FRAME_CLEAN"}
+
+class UniqueKeyIndex:
+    """Normalized barcode / framecode -> row ids, so duplicate checks are dict lookups.
+
+    Built once per inventory version, then updated in place by the app's own writes.
+    Keys map to a set because older data may already hold duplicates (or blanks).
+    """
+
+    def __init__(self, stable_row_ids=True):
+        self.stable_row_ids = stable_row_ids
+        self._lock = threading.Lock()
+        self._version = None
+        self._rows = {column: {} for column in KEY_COLUMNS}
+
+    def sync(self, version, df):
+        with self._lock:
+            if self._version == version:
+                return
+            for column, clean_column in KEY_COLUMNS.items():
+                rows = {}
+                if clean_column in df.columns:
+                    for key, row_id in zip(df[clean_column], df.index):
+                        rows.setdefault(key, set()).add(row_id)
+                self._rows[column] = rows
+            self._version = version
+
+    def rows(self, column, key):
+        return self._rows[column].get(key, set())
+
+    def exists(self, column, key, exclude=None):
+        """Whether a row other than `exclude` already has `key` (a normalized value)."""
+        ids = self._rows[column].get(key)
+        if not ids:
+            return False
+        return exclude is None or len(ids) > 1 or exclude not in ids
+
+    def _add(self, column, key, row_id):
+        self._rows[column].setdefault(key, set()).add(row_id)
+
+    def _discard(self, column, key, row_id):
+        ids = self._rows[column].get(key)
+        if ids is not None:
+            ids.discard(row_id)
+            if not ids:
+                del self._rows[column][key]
+
+    def _shift(self, after, delta):
+        # Renumber positional ids after an insert at the front or a delete in the middle
+        for rows in self._rows.values():
+            for key, ids in rows.items():
+                if any(i >= after for i in ids):
+                    rows[key] = {i + delta if i >= after else i for i in ids}
+
+    def record_insert(self, previous, version, row_id, row, prepend=False):
+        """Account for an inserted row written at `previous`, giving table version `version`.
+
+        Applied only when the index is still at `previous`; otherwise another writer got in
+        between and the index is left for the next sync to rebuild.
+        """
+        with self._lock:
+            if self._version != previous:
+                self._version = None  # missed someone else's write: rebuild on next sync
+                return
+            if prepend and not self.stable_row_ids:
+                self._shift(row_id, 1)
+            for column in KEY_COLUMNS:
+                self._add(column, clean_barcode(row.get(column, "")), row_id)
+            self._version = version
+
+    def record_update(self, previous, version, row_id, old_row, new_row):
+        with self._lock:
+            if self._version != previous:
+                self._version = None
+                return
+            for column in KEY_COLUMNS:
+                if column in new_row:
+                    self._discard(column, clean_barcode(old_row.get(column, "")), row_id)
+                    self._add(column, clean_barcode(new_row[column]), row_id)
+            self._version = version
+
+    def record_delete(self, previous, version, row_id, old_row):
+        with self._lock:
+            if self._version != previous:
+                self._version = None
+                return
+            for column in KEY_COLUMNS:
+                self._discard(column, clean_barcode(old_row.get(column, "")), row_id)
+            if not self.stable_row_ids:
+                self._shift(row_id + 1, -1)
+            self._version = version
+
+class KeySet:
+    """Normalized barcodes present in a table, for O(1) membership tests on list-style tables.
+
+    Same lifecycle as UniqueKeyIndex, without row ids: the set is the same however the rows
+    are numbered, so a prepend needs no renumbering.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        self._keys = set()
+
+    def sync(self, version, df):
+        with self._lock:
+            if self._version == version:
+                return
+            self._keys = set(df["BARCODE_CLEAN"]) if "BARCODE_CLEAN" in df.columns else set()
+            self._keys.discard("")
+            self._version = version
+
+    def __contains__(self, key):
+        return key in self._keys
+
+    def __len__(self):
+        return len(self._keys)
+
+    def record(self, previous, version, added=(), removed=()):
+        """Account for keys added / removed by a write at `previous` that gave table version `version`."""
+        with self._lock:
+            if self._version != previous:
+                self._version = None
+                return
+            self._keys.update(k for k in added if k)
+            self._keys.difference_update(removed)
+            self._version = version
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+def get_key_index(table):
+    """Process-wide unique-key index for `table`, in step with its current inventory version."""
+    with _indexes_lock:
+        index = _indexes.setdefault(table.name, UniqueKeyIndex(table.stable_row_ids))
+    index.sync(table.version(), table.load_cached())
+    return index
+
+_key_sets = {}
+
+def get_key_set(table):
+    """Process-wide barcode set for `table`, in step with its current inventory version."""
+    with _indexes_lock:
+        keys = _key_sets.setdefault(table.name, KeySet())
+    keys.sync(table.version(), table.load_cached())
+    return keys
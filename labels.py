@@ -0,0 +1,144 @@
+import io
+import os
+import threading
+import multiprocessing
+from dataclasses import dataclass
+from concurrent.futures import ProcessPoolExecutor
+import pandas as pd
+from PIL import Image, ImageDraw, ImageFont
+from barcode_utils import clean_barcode
+from barcode_images import render_barcode
+
+# Batches smaller than this are rendered in-process; the pool only pays off for real shipments
+PARALLEL_MIN_LABELS = 48
+LABEL_SHEET_WORKERS = int(os.environ.get("LABEL_SHEET_WORKERS", "0")) or None
+
+PAGE_SIZES_MM = {"A4": (210, 297), "Letter": (215.9, 279.4)}
+
+@dataclass(frozen=True)
+class SheetLayout:
+    columns: int = 3
+    rows: int = 8
+    page_width_mm: float = 210
+    page_height_mm: float = 297
+    margin_mm: float = 8
+    gap_mm: float = 2
+    dpi: int = 300
+
+    @property
+    def labels_per_page(self):
+        return self.columns * self.rows
+
+    def px(self, mm):
+        return int(round(mm / 25.4 * self.dpi))
+
+def _text(val):
+    return "" if pd.isnull(val) else str(val)
+
+def format_rrp(rrp):
+    try:
+        return f"${float(rrp):.2f}"
+    except (TypeError, ValueError):
+        return _text(rrp)
+
+def label_fields(product):
+    """The fields printed on a price label, as display strings."""
+    return {
+        "barcode": clean_barcode(product.get("BARCODE", "")),
+        "rrp": format_rrp(product.get("RRP", "")),
+        "framecode": _text(product.get("FRAME NO.", "")),
+        "model": _text(product.get("MODEL", "")),
+        "manufacturer": _text(product.get("MANUFACTURER", "")),
+        "colour": _text(product.get("F COLOUR", "")),
+        "size": _text(product.get("SIZE", "")),
+    }
+
+def _font(size):
+    for name in ("DejaVuSans.ttf", "Arial.ttf"):
+        try:
+            return ImageFont.truetype(name, size)
+        except OSError:
+            continue
+    try:
+        return ImageFont.load_default(size)
+    except TypeError:  # Pillow < 10.1
+        return ImageFont.load_default()
+
+def _draw_label(page, draw, fields, box, fonts):
+    left, top, width, height = box
+    pad = max(2, width // 40)
+    y = top + pad
+    if fields["barcode"]:
+        bars = Image.open(io.BytesIO(render_barcode(fields["barcode"]))).convert("L")
+        bar_width = width - 2 * pad
+        bar_height = max(1, int(height * 0.3))
+        bars = bars.resize((bar_width, bar_height), Image.NEAREST)
+        page.paste(bars, (left + pad, y))
+        y += bar_height + pad // 2
+    small, large = fonts
+    lines = [
+        (fields["barcode"], small),
+        (f'{fields["rrp"]} Inc GST', large),
+        (f'{fields["framecode"]}  {fields["model"]}', small),
+        (f'{fields["manufacturer"]}  {fields["colour"]}  {fields["size"]}', small),
+    ]
+    for text, font in lines:
+        if y >= top + height:
+            break
+        draw.text((left + pad, y), text, fill=0, font=font)
+        y += getattr(font, "size", 10) + pad // 2
+
+def render_page(fields_list, layout):
+    """One sheet of labels as raw 8-bit grayscale bytes (cheap to ship back from a worker)."""
+    width, height = layout.px(layout.page_width_mm), layout.px(layout.page_height_mm)
+    page = Image.new("L", (width, height), 255)
+    draw = ImageDraw.Draw(page)
+    margin, gap = layout.px(layout.margin_mm), layout.px(layout.gap_mm)
+    cell_w = (width - 2 * margin - (layout.columns - 1) * gap) // layout.columns
+    cell_h = (height - 2 * margin - (layout.rows - 1) * gap) // layout.rows
+    fonts = (_font(max(8, cell_h // 12)), _font(max(10, cell_h // 7)))
+    for i, fields in enumerate(fields_list):
+        row, col = divmod(i, layout.columns)
+        box = (margin + col * (cell_w + gap), margin + row * (cell_h + gap), cell_w, cell_h)
+        _draw_label(page, draw, fields, box, fonts)
+    return page.tobytes()
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def _get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # Spawned, not forked: the Streamlit server is multithreaded, and a forked child would
+            # inherit its locks mid-use (and a copy of every session's state)
+            _pool = ProcessPoolExecutor(max_workers=LABEL_SHEET_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+        return _pool
+
+def build_label_sheet(products, layout=SheetLayout(), fmt="pdf", parallel=None):
+    """Lay `products` (row dicts) out on sheets and return a multi-page PDF or one tall PNG."""
+    fields = [label_fields(p) for p in products]
+    if not fields:
+        raise ValueError("No labels to print.")
+    per_page = layout.labels_per_page
+    chunks = [fields[i:i + per_page] for i in range(0, len(fields), per_page)]
+    if parallel is None:
+        parallel = len(fields) >= PARALLEL_MIN_LABELS and len(chunks) > 1
+    if parallel:
+        raw_pages = list(_get_pool().map(render_page, chunks, [layout] * len(chunks)))
+    else:
+        raw_pages = [render_page(chunk, layout) for chunk in chunks]
+    size = (layout.px(layout.page_width_mm), layout.px(layout.page_height_mm))
+    # Bilevel pages keep bars crisp and shrink the file roughly tenfold
+    pages = [Image.frombytes("L", size, raw).convert("1", dither=Image.Dither.NONE) for raw in raw_pages]
+    buffer = io.BytesIO()
+    if fmt == "pdf":
+        pages[0].save(buffer, "PDF", save_all=True, append_images=pages[1:], resolution=layout.dpi)
+    elif fmt == "png":
+        sheet = Image.new("1", (size[0], size[1] * len(pages)), 1)
+        for i, page in enumerate(pages):
+            sheet.paste(page, (0, i * size[1]))
+        sheet.save(buffer, "PNG", dpi=(layout.dpi, layout.dpi))
+    else:
+        raise ValueError(f"Unknown label sheet format '{fmt}'. Choose 'pdf' or 'png'.")
+    return buffer.getvalue()
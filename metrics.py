@@ -0,0 +1,217 @@
+import os
+import json
+import time
+import bisect
+import tempfile
+import threading
+from contextlib import contextmanager
+
+# Latency histogram buckets (seconds): sub-millisecond lookups up to multi-second workbook loads
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+# Seconds between writes of a worker's metrics to the shared directory (multi-worker server)
+METRICS_FLUSH_INTERVAL = float(os.environ.get("BARCODE_METRICS_FLUSH_INTERVAL", "1"))
+
+METRIC_HELP = {
+    "barcode_stage_seconds": "Time spent per hot-path stage (load, lookup, normalize, render, persist, ...).",
+    "barcode_http_request_seconds": "Barcode server request latency by endpoint.",
+    "barcode_http_requests_total": "Barcode server requests by endpoint and status.",
+    "barcode_lookups_total": "Barcode lookups by result (hit or miss).",
+}
+
+def _key(name, labels):
+    return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+class MetricsRegistry:
+    """Process-local latency histograms and counters, exported in Prometheus text format."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.clear()
+
+    def clear(self):
+        # Also used right after a fork, so the lock is replaced rather than acquired
+        self._lock = threading.Lock()
+        self._histograms = {}  # (name, labels) -> per-bucket counts (not cumulative) + [sum, count]
+        self._counters = {}
+        self.changes = 0
+
+    def observe(self, name, seconds, **labels):
+        key = _key(name, labels)
+        i = bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            values = self._histograms.get(key)
+            if values is None:
+                values = self._histograms[key] = [0] * len(self.buckets) + [0.0, 0]
+            if i < len(self.buckets):
+                values[i] += 1
+            values[-2] += seconds
+            values[-1] += 1
+            self.changes += 1
+
+    def inc(self, name, amount=1, **labels):
+        key = _key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+            self.changes += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "buckets": list(self.buckets),
+                "histograms": [[name, list(labels), list(values)] for (name, labels), values in self._histograms.items()],
+                "counters": [[name, list(labels), value] for (name, labels), value in self._counters.items()],
+            }
+
+def merge_snapshots(snapshots):
+    """Sum snapshots from several processes (same buckets) into one."""
+    histograms, counters = {}, {}
+    buckets = list(LATENCY_BUCKETS)
+    for snapshot in snapshots:
+        buckets = snapshot["buckets"]
+        for name, labels, values in snapshot["histograms"]:
+            key = (name, tuple(map(tuple, labels)))
+            total = histograms.setdefault(key, [0] * len(values))
+            for i, v in enumerate(values):
+                total[i] += v
+        for name, labels, value in snapshot["counters"]:
+            key = (name, tuple(map(tuple, labels)))
+            counters[key] = counters.get(key, 0) + value
+    return {
+        "buckets": buckets,
+        "histograms": [[name, list(labels), values] for (name, labels), values in histograms.items()],
+        "counters": [[name, list(labels), value] for (name, labels), value in counters.items()],
+    }
+
+def _labels_text(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+def render_prometheus(snapshot):
+    """Prometheus text exposition (version 0.0.4) of a snapshot."""
+    lines = []
+    described = set()
+
+    def describe(name, kind):
+        if name not in described:
+            described.add(name)
+            if name in METRIC_HELP:
+                lines.append(f"# HELP {name} {METRIC_HELP[name]}")
+            lines.append(f"# TYPE {name} {kind}")
+
+    buckets = snapshot["buckets"]
+    for name, labels, values in sorted(snapshot["histograms"], key=lambda h: (h[0], h[1])):
+        describe(name, "histogram")
+        cumulative = 0
+        for bound, count in zip(buckets, values):
+            cumulative += count
+            lines.append(f"{name}_bucket{_labels_text(labels, [('le', repr(float(bound)))])} {cumulative}")
+        lines.append(f"{name}_bucket{_labels_text(labels, [('le', '+Inf')])} {values[-1]}")
+        lines.append(f"{name}_sum{_labels_text(labels)} {values[-2]}")
+        lines.append(f"{name}_count{_labels_text(labels)} {values[-1]}")
+    for name, labels, value in sorted(snapshot["counters"], key=lambda c: (c[0], c[1])):
+        describe(name, "counter")
+        lines.append(f"{name}{_labels_text(labels)} {value}")
+    return "\n".join(lines) + "\n"
+
+_registry = MetricsRegistry()
+_local = threading.local()
+
+def get_registry():
+    return _registry
+
+def observe(name, seconds, **labels):
+    _registry.observe(name, seconds, **labels)
+
+def inc(name, amount=1, **labels):
+    _registry.inc(name, amount, **labels)
+
+@contextmanager
+def timed(stage):
+    """Time a hot-path stage into barcode_stage_seconds and, in a Streamlit rerun, the rerun's trace."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        _registry.observe("barcode_stage_seconds", elapsed, stage=stage)
+        trace = getattr(_local, "trace", None)
+        if trace is not None:
+            trace.append((stage, elapsed))
+
+# Per-rerun traces for the Streamlit timing panel (each rerun runs on its own script thread)
+
+def begin_rerun():
+    _local.trace = []
+    _local.started = time.perf_counter()
+
+def rerun_timings():
+    """(stage, calls, total seconds) for the current rerun, plus the rerun's elapsed time so far."""
+    trace = getattr(_local, "trace", None) or []
+    totals = {}
+    for stage, elapsed in trace:
+        calls, total = totals.get(stage, (0, 0.0))
+        totals[stage] = (calls + 1, total + elapsed)
+    started = getattr(_local, "started", None)
+    elapsed = time.perf_counter() - started if started is not None else 0.0
+    return [(stage, calls, total) for stage, (calls, total) in totals.items()], elapsed
+
+def show_timing_panel():
+    """Optional sidebar panel with this rerun's stage timings."""
+    import streamlit as st
+    if not st.sidebar.checkbox("Show stage timings", key="show_stage_timings"):
+        return
+    stages, elapsed = rerun_timings()
+    st.sidebar.write(f"This rerun: {elapsed * 1000:.1f} ms")
+    if stages:
+        st.sidebar.table([
+            {"stage": stage, "calls": calls, "ms": round(total * 1000, 2)} for stage, calls, total in stages
+        ])
+
+# Multi-worker server: each worker flushes its registry to <dir>/<pid>.json and /metrics sums them
+
+_shared_dir = None
+
+def share_metrics(directory):
+    """Have this process (and workers forked after it) publish metrics into `directory`."""
+    global _shared_dir
+    _shared_dir = directory
+
+def _write_shared():
+    path = os.path.join(_shared_dir, f"{os.getpid()}.json")
+    fd, tmp_path = tempfile.mkstemp(prefix=f"{os.getpid()}.", suffix=".tmp", dir=_shared_dir)
+    with os.fdopen(fd, "w") as f:
+        json.dump(_registry.snapshot(), f)
+    os.replace(tmp_path, path)
+
+def start_metrics_flusher(interval=METRICS_FLUSH_INTERVAL):
+    """Background thread writing this worker's metrics whenever they changed."""
+    def flush_loop():
+        written = None
+        while True:
+            if _registry.changes != written:
+                written = _registry.changes
+                try:
+                    _write_shared()
+                except OSError:
+                    pass
+            time.sleep(interval)
+    threading.Thread(target=flush_loop, name="metrics-flusher", daemon=True).start()
+
+def collect():
+    """This process's metrics, summed with every worker's when metrics are shared."""
+    if _shared_dir is None:
+        return _registry.snapshot()
+    _write_shared()
+    snapshots = []
+    for name in os.listdir(_shared_dir):
+        if not name.endswith(".json"):
+            continue
+        try:
+            with open(os.path.join(_shared_dir, name)) as f:
+                snapshots.append(json.load(f))
+        except (OSError, ValueError):
+            continue
+    return merge_snapshots(snapshots)
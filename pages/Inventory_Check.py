@@ -3,133 +3,194 @@ import pandas as pd
 import os
 from datetime import datetime
 import io
-
-# Paths (parent directory for inventory files)
-MAIN_INVENTORY = os.path.join(os.path.dirname(__file__), "..", "inventory.xlsx")
-SECONDARY_INVENTORY = os.path.join(os.path.dirname(__file__), "..", "secondary_inventory.xlsx")
-UNFOUND_BARCODES = os.path.join(os.path.dirname(__file__), "..", "unfound_barcodes.xlsx")
-
-def clean_barcode(val):
-    if pd.isnull(val):
-        return ""
-    s = str(val).strip().replace('\u200b','').replace('\u00A0','')
-    if '.' in s:
-        int_part, dec_part = s.split('.', 1)
-        if dec_part == '0':
-            s = int_part
-    return s
-
-def ensure_inventory_files(main_file, secondary_file, unfound_file):
-    main_df = pd.read_excel(main_file)
+from barcode_utils import clean_barcode, clean_barcode_series
+from inventory_storage import get_table, strip_derived_columns, UNFOUND_COLUMNS
+from metrics import timed, begin_rerun, show_timing_panel
+from inventory_query import show_table_page
+from key_index import get_key_set
+from stock_count import SCAN_FILE_TYPES, preview_scan_file, iter_scan_chunks
+
+main_table = get_table("main")
+secondary_table = get_table("secondary")
+unfound_table = get_table("unfound")
+begin_rerun()
+
+def ensure_inventory_files(main_table, secondary_table, unfound_table):
+    main_df = main_table.load_cached()
     # Secondary inventory
-    if not os.path.exists(secondary_file):
-        empty_df = pd.DataFrame(columns=main_df.columns)
-        empty_df.to_excel(secondary_file, index=False)
-    secondary_df = pd.read_excel(secondary_file)
+    secondary_table.ensure(strip_derived_columns(main_df).columns)
+    secondary_df = secondary_table.load_cached()
     # Unfound barcodes
-    if not os.path.exists(unfound_file):
-        unfound_df = pd.DataFrame(columns=["BARCODE", "Timestamp"])
-        unfound_df.to_excel(unfound_file, index=False)
-    unfound_df = pd.read_excel(unfound_file)
+    unfound_table.ensure(UNFOUND_COLUMNS)
+    unfound_df = unfound_table.load_cached()
     return main_df, secondary_df, unfound_df
 
-def add_to_secondary(result, secondary_df):
-    secondary_df["BARCODE_CLEAN"] = secondary_df["BARCODE"].apply(clean_barcode)
+def add_to_secondary(result):
     search_barcode_clean = result.iloc[0]["BARCODE_CLEAN"]
-    if not secondary_df[secondary_df["BARCODE_CLEAN"] == search_barcode_clean].empty:
-        st.warning("Product already exists in secondary inventory!")
-    else:
-        secondary_df = pd.concat([result.drop(columns=["BARCODE_CLEAN"], errors="ignore"), secondary_df], ignore_index=True)
-        secondary_df.to_excel(SECONDARY_INVENTORY, index=False)
-        st.success("Product added to secondary inventory!")
-    return secondary_df
-
-def remove_from_secondary(search_barcode_clean, secondary_df):
-    secondary_df["BARCODE_CLEAN"] = secondary_df["BARCODE"].apply(clean_barcode)
-    secondary_df = secondary_df[secondary_df["BARCODE_CLEAN"] != search_barcode_clean]
-    secondary_df.to_excel(SECONDARY_INVENTORY, index=False)
+    with timed("persist"), secondary_table.transaction() as (current, previous):
+        secondary_keys.sync(previous, current)
+        if search_barcode_clean in secondary_keys:
+            st.warning("Product already exists in secondary inventory!")
+            return
+        secondary_table.insert_many(strip_derived_columns(result).to_dict("records"), prepend=True)
+        version = secondary_table.version()
+    secondary_keys.record(previous, version, added=[search_barcode_clean])
+    st.success("Product added to secondary inventory!")
+
+def remove_from_secondary(search_barcode_clean):
+    with timed("persist"), secondary_table.transaction() as (current, previous):
+        secondary_keys.sync(previous, current)
+        if search_barcode_clean not in secondary_keys:
+            st.info("Product is not in secondary inventory.")
+            return
+        secondary_table.delete_barcode(search_barcode_clean)
+        version = secondary_table.version()
+    secondary_keys.record(previous, version, removed=[search_barcode_clean])
     st.success("Product removed from secondary inventory!")
-    return secondary_df
 
-def add_to_unfound(search_barcode_clean, unfound_df):
-    if not unfound_df[unfound_df["BARCODE"].astype(str).apply(clean_barcode) == search_barcode_clean].empty:
-        st.info("Barcode already in unfound list.")
-    else:
+def add_to_unfound(search_barcode_clean):
+    with timed("persist"), unfound_table.transaction() as (current, previous):
+        unfound_keys.sync(previous, current)
+        if search_barcode_clean in unfound_keys:
+            st.info("Barcode already in unfound list.")
+            return
         new_row = {"BARCODE": search_barcode_clean, "Timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S")}
-        unfound_df = pd.concat([pd.DataFrame([new_row]), unfound_df], ignore_index=True)
-        unfound_df.to_excel(UNFOUND_BARCODES, index=False)
-        st.success("Barcode added to unfound barcodes list!")
-    return unfound_df
-
-def delete_unfound_barcode(barcode_to_delete, unfound_df):
-    clean_barcodes = unfound_df["BARCODE"].astype(str).apply(clean_barcode)
-    new_unfound_df = unfound_df[clean_barcodes != barcode_to_delete]
-    new_unfound_df.to_excel(UNFOUND_BARCODES, index=False)
-    st.success(f"Deleted barcode: {barcode_to_delete}")
-    return new_unfound_df
+        unfound_table.insert_many([new_row], prepend=True)
+        version = unfound_table.version()
+    unfound_keys.record(previous, version, added=[search_barcode_clean])
+    st.success("Barcode added to unfound barcodes list!")
+
+def delete_unfound_barcodes(barcodes):
+    with timed("persist"), unfound_table.transaction() as (current, previous):
+        unfound_keys.sync(previous, current)
+        deleted = unfound_table.delete_barcodes(barcodes)
+        version = unfound_table.version()
+    unfound_keys.record(previous, version, removed=barcodes)
+    return deleted
+
+def delete_selected_unfound():
+    # Button callback: runs before the page is drawn, so the list below is already up to date
+    deleted = delete_unfound_barcodes(st.session_state.get("unfound_delete_selection", []))
+    st.session_state["unfound_delete_selection"] = []
+    st.session_state["unfound_deleted"] = deleted
+
+def unfound_workbook():
+    buffer = io.BytesIO()
+    strip_derived_columns(unfound_table.load_cached()).to_excel(buffer, index=False, engine='openpyxl')
+    return buffer.getvalue()
+
+def transfer_scan_list(codes, main_df):
+    """Known codes go to the secondary inventory and unknown ones to the unfound list, one write each.
+
+    Returns (added to secondary, already there, added to unfound, already there).
+    """
+    codes = list(dict.fromkeys(c for c in codes if c))
+    known = [c for c in codes if c in main_keys]
+    unknown = [c for c in codes if c not in main_keys]
+    with secondary_table.transaction() as (current, previous):
+        secondary_keys.sync(previous, current)
+        new_known = [c for c in known if c not in secondary_keys]
+        if new_known:
+            first_rows = main_df[main_df["BARCODE_CLEAN"].isin(set(new_known))].drop_duplicates("BARCODE_CLEAN")
+            secondary_table.insert_many(strip_derived_columns(first_rows).to_dict("records"), prepend=True)
+            secondary_keys.record(previous, secondary_table.version(), added=new_known)
+    with unfound_table.transaction() as (current, previous):
+        unfound_keys.sync(previous, current)
+        new_unknown = [c for c in unknown if c not in unfound_keys]
+        if new_unknown:
+            stamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            unfound_table.insert_many([{"BARCODE": c, "Timestamp": stamp} for c in new_unknown], prepend=True)
+            unfound_keys.record(previous, unfound_table.version(), added=new_unknown)
+    return len(new_known), len(known) - len(new_known), len(new_unknown), len(unknown) - len(new_unknown)
 
 st.title("Inventory Check / Product Transfer")
 
-main_df, secondary_df, unfound_df = ensure_inventory_files(MAIN_INVENTORY, SECONDARY_INVENTORY, UNFOUND_BARCODES)
+with timed("load"):
+    main_df, secondary_df, unfound_df = ensure_inventory_files(main_table, secondary_table, unfound_table)
+    main_keys = get_key_set(main_table)
+    secondary_keys = get_key_set(secondary_table)
+    unfound_keys = get_key_set(unfound_table)
 
 search_barcode = st.text_input("Scan or enter barcode")
-search_barcode_clean = clean_barcode(search_barcode)
+with timed("normalize"):
+    search_barcode_clean = clean_barcode(search_barcode)
 
-main_df["BARCODE_CLEAN"] = main_df["BARCODE"].apply(clean_barcode)
-result = main_df[main_df["BARCODE_CLEAN"] == search_barcode_clean]
+with timed("lookup"):
+    result = main_df[main_df["BARCODE_CLEAN"] == search_barcode_clean]
 product_row = result.iloc[0] if not result.empty else None
 
 if search_barcode:
     if not result.empty:
         st.success("Product found!")
         st.write("**Product Details:**")
-        st.write(result.drop(columns=["BARCODE_CLEAN"], errors="ignore"))
+        st.write(strip_derived_columns(result))
     else:
         st.warning("Product not found in main inventory.")
         # Option to add to unfound barcodes
         if st.button("Add barcode to unfound barcodes list"):
-            unfound_df = add_to_unfound(search_barcode_clean, unfound_df)
+            add_to_unfound(search_barcode_clean)
 
 if product_row is not None:
     col1, col2 = st.columns(2)
     with col1:
         if st.button("Add Product to Secondary Inventory"):
-            secondary_df = add_to_secondary(result, secondary_df)
+            add_to_secondary(result)
     with col2:
         if st.button("Remove Product from Secondary Inventory"):
-            secondary_df = remove_from_secondary(search_barcode_clean, secondary_df)
+            remove_from_secondary(search_barcode_clean)
+
+with st.expander("📋 Transfer a scan list"):
+    st.write("Known barcodes are added to the secondary inventory and unknown ones to the unfound list.")
+    pasted = st.text_area("Scanned barcodes (one per line)", key="transfer_pasted")
+    scan_file = st.file_uploader("Or upload a scan file", type=SCAN_FILE_TYPES, key="transfer_file")
+    scan_column = None
+    if scan_file is not None:
+        columns = preview_scan_file(scan_file, scan_file.name).columns.tolist()
+        scan_column = st.selectbox("Column containing barcodes", columns, key="transfer_column")
+    if st.button("Transfer scan list"):
+        with timed("normalize"):
+            codes = [clean_barcode(line) for line in pasted.splitlines() if line.strip()]
+            if scan_column is not None:
+                for chunk in iter_scan_chunks(scan_file, scan_file.name, scan_column):
+                    codes += clean_barcode_series(chunk.dropna()).tolist()
+        if not codes:
+            st.info("No barcodes to transfer.")
+        else:
+            with timed("persist"):
+                added, present, unfound_added, unfound_present = transfer_scan_list(codes, main_df)
+            st.success(f"Added {added} products to secondary inventory ({present} already there).")
+            if unfound_added or unfound_present:
+                st.warning(f"Added {unfound_added} unknown barcodes to the unfound list ({unfound_present} already there).")
 
 st.markdown("---")
 st.subheader("Secondary Inventory Preview")
-st.dataframe(secondary_df.drop(columns=["BARCODE_CLEAN"], errors="ignore"), use_container_width=True)  
+show_table_page(secondary_table, "secondary_table")
 
 st.markdown("---")
 st.subheader("Unfound Barcodes List")
 
-# Show table first
-st.dataframe(unfound_df, use_container_width=True)
-
-# Show per-row delete buttons below the table
-if not unfound_df.empty:
-    st.write("Delete a barcode from the unfound list:")
-    for idx, row in unfound_df.iterrows():
-        barcode_cleaned = clean_barcode(row["BARCODE"])
-        cols = st.columns([2,1])
-        with cols[0]:
-            st.write(f'{row["BARCODE"]} ({row["Timestamp"]})')
-        with cols[1]:
-            if st.button(f"Delete", key=f"delete_unfound_{idx}"):
-                unfound_df = delete_unfound_barcode(barcode_cleaned, unfound_df)
-                # No rerun; UI updates on next interaction
+if "unfound_deleted" in st.session_state:
+    deleted = st.session_state.pop("unfound_deleted")
+    st.success(f"Deleted {deleted} unfound barcode{'s' if deleted != 1 else ''}.")
+
+if len(unfound_table.load_cached()):
+    # Only the page on screen is rendered (and offered for deletion), however long the list grows
+    unfound_page = show_table_page(unfound_table, "unfound_table")
+    to_delete = st.multiselect(
+        "Select unfound barcodes on this page to delete",
+        list(dict.fromkeys(unfound_page["BARCODE_CLEAN"])),
+        key="unfound_delete_selection",
+    )
+    st.button("Delete selected", disabled=not to_delete, on_click=delete_selected_unfound)
 
-    buffer = io.BytesIO()
-    unfound_df.to_excel(buffer, index=False, engine='openpyxl')
-    buffer.seek(0)
+    # The workbook is only built when the button is clicked
     st.download_button(
         label="Download Unfound Barcodes as Excel",
-        data=buffer,
+        data=unfound_workbook,
         file_name="unfound_barcodes.xlsx",
         mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
     )
 else:
     st.write("No unfound barcodes.")
+
+show_timing_panel()
@@ -0,0 +1,95 @@
+import streamlit as st
+import pandas as pd
+from count_session import get_count_session, list_count_sessions
+from inventory_storage import get_table, BARCODE_COLUMN
+from key_index import get_key_index
+from labels import label_fields
+from stock_count import summarize
+from metrics import timed, begin_rerun, show_timing_panel
+
+main_table = get_table("main")
+begin_rerun()
+
+st.title("Stock Count Session")
+st.write("Scan items one after another; every scan is saved immediately, so a refresh or crash resumes where you left off.")
+
+if not main_table.exists():
+    st.error("No inventory.xlsx found.")
+    st.stop()
+
+existing_sessions = list_count_sessions()
+session_name = st.text_input(
+    "Session name", value=st.session_state.get("count_session_name") or (existing_sessions[-1] if existing_sessions else "stock-count"),
+    help="Use the same name to resume a count. Existing sessions: " + (", ".join(existing_sessions) or "none"),
+)
+try:
+    with timed("load"):
+        session = get_count_session(session_name, main_table)
+except ValueError as e:
+    st.error(str(e))
+    st.stop()
+st.session_state["count_session_name"] = session.name
+
+# Scans only touch the session's counters; the inventory frame is not re-filtered per scan
+with st.form("count_scan_form", clear_on_submit=True):
+    scanned = st.text_input("Scan barcode", key="count_scan_input")
+    if st.form_submit_button("Count") and scanned.strip():
+        with timed("persist"):
+            st.session_state["count_last_scan"] = session.scan(scanned)[0]
+
+# Only the barcode is kept across reruns: row ids can move when the inventory changes in between
+barcode = st.session_state.get("count_last_scan")
+if barcode:
+    counted, expected = session.status(barcode)
+    row_ids = get_key_index(main_table).rows(BARCODE_COLUMN, barcode)
+    if expected is None or not row_ids:
+        st.error(f"{barcode}: not in inventory (scanned {counted}×)")
+    else:
+        fields = label_fields(main_table.load_cached().loc[min(row_ids)])
+        message = f"{barcode} · {fields['model']} {fields['colour']}: counted {counted} of {expected}"
+        (st.success if counted <= expected else st.warning)(message)
+
+totals = session.totals()
+metric_cols = st.columns(6)
+for col, (label, key) in zip(metric_cols, [
+    ("Scanned", "scanned"), ("Items", "distinct"), ("Matched", "matched"),
+    ("Over", "over"), ("Short", "short"), ("Unexpected", "unexpected"),
+]):
+    col.metric(label, totals[key])
+if session.started:
+    st.caption(f"Started {session.started}")
+
+undo_col, checkpoint_col = st.columns(2)
+with undo_col:
+    if st.button("Undo last scan"):
+        undone = session.undo_last()
+        st.session_state["count_last_scan"] = undone[0] if undone else None
+        st.rerun()
+with checkpoint_col:
+    if st.button("Save checkpoint now"):
+        session.checkpoint()
+        st.success("Checkpoint saved.")
+
+if session.recent:
+    st.write("Recent scans:")
+    st.dataframe(pd.DataFrame(list(session.recent), columns=["BARCODE", "CHANGE", "TIME"]), use_container_width=True)
+
+with st.expander("Finish count"):
+    if st.button("Build variance report"):
+        df = main_table.load_cached()
+        with timed("reconcile"):
+            report = session.report(df)
+        st.dataframe(summarize(report), use_container_width=True)
+        st.dataframe(report[report["STATUS"] != "matched"], use_container_width=True)
+        st.download_button(
+            label="Download Variance Report (CSV)",
+            data=report.to_csv().encode("utf-8"),
+            file_name=f"{session.name}_variance.csv",
+            mime="text/csv",
+        )
+    if st.button("Discard this session"):
+        session.discard()
+        st.session_state["count_last_scan"] = None
+        st.success("Session discarded.")
+
+show_timing_panel()
@@ -3,38 +3,38 @@
 import streamlit as st
 import pandas as pd
 import os
-import barcode
-from barcode.writer import ImageWriter
-import io
 import base64
+import time
 from streamlit_js_eval import streamlit_js_eval
+from barcode_images import render_barcode, MIME_TYPES
+from barcode_utils import clean_barcode
+from labels import SheetLayout, build_label_sheet, PAGE_SIZES_MM
+from thermal_labels import (
+    LANGUAGES, THERMAL_LABEL_LANGUAGE, THERMAL_PRINTER_HOST, THERMAL_PRINTER_PORT,
+    build_thermal_labels, send_to_printer, write_labels,
+)
+from inventory_storage import get_table, strip_derived_columns
+from metrics import timed, begin_rerun, show_timing_panel
+from inventory_query import show_table_page
+from product_search import pick_product
 
-INVENTORY_FILE = os.path.join(os.path.dirname(__file__), "..", "inventory.xlsx")
+# SVG labels are vector (crisp at any print size) and far cheaper to produce than PNG
+LABEL_IMAGE_FORMAT = "svg"
+
+main_table = get_table("main")
+begin_rerun()
 
 def load_inventory():
-    if os.path.exists(INVENTORY_FILE):
-        return pd.read_excel(INVENTORY_FILE)
+    if main_table.exists():
+        with timed("load"):
+            return main_table.load_cached()
     else:
         st.error("No inventory.xlsx found.")
         st.stop()
 
-def clean_barcode(val):
-    if pd.isnull(val):
-        return ""
-    s = str(val).strip().replace('\u200b','').replace('\u00A0','')
-    if '.' in s:
-        int_part, dec_part = s.split('.', 1)
-        if dec_part == '0':
-            s = int_part
-    return s
-
-def barcode_image_base64(code):
-    CODE128 = barcode.get_barcode_class('code128')
-    my_code = CODE128(str(code), writer=ImageWriter())
-    buffer = io.BytesIO()
-    my_code.write(buffer, options={"write_text": False})
-    buffer.seek(0)
-    img_bytes = buffer.getvalue()
+def barcode_image_base64(code, fmt=LABEL_IMAGE_FORMAT):
+    with timed("render"):
+        img_bytes = render_barcode(code, fmt=fmt)
     img_b64 = base64.b64encode(img_bytes).decode()
     return img_b64
 
@@ -66,31 +66,28 @@ df = load_inventory()
 if len(df) == 0:
     st.info("No products found in inventory.")
 else:
-    product_options = df.apply(lambda row: f"{clean_barcode(row.get('BARCODE', ''))} - {row.get('MODEL', '')}", axis=1)
-    selected_idx = st.selectbox(
-        "Choose product",
-        options=df.index.tolist(),
-        format_func=lambda i: product_options[i]
-    )
-    product = df.loc[selected_idx]
-    barcode_value = product.get("BARCODE", "")
-    barcode_b64 = barcode_image_base64(barcode_value)
-    rrp = str(product.get("RRP", ""))
-    try:
-        rrp_display = f"${float(rrp):.2f}"
-    except:
-        rrp_display = rrp
-    framecode = str(product.get("FRAME NO.", ""))
-    model = str(product.get("MODEL", ""))
-    manufact = str(product.get("MANUFACTURER", ""))
-    fcolour = str(product.get("F COLOUR", ""))
-    size = str(product.get("SIZE", ""))
-
-    # Print label block with all details
-    st.markdown(f"""
+    with timed("search"):
+        selected_idx = pick_product(main_table, "Choose product", "label_product")
+    if selected_idx is not None:
+        product = df.loc[selected_idx]
+        barcode_value = product.get("BARCODE", "")
+        barcode_b64 = barcode_image_base64(barcode_value)
+        rrp = str(product.get("RRP", ""))
+        try:
+            rrp_display = f"${float(rrp):.2f}"
+        except:
+            rrp_display = rrp
+        framecode = str(product.get("FRAME NO.", ""))
+        model = str(product.get("MODEL", ""))
+        manufact = str(product.get("MANUFACTURER", ""))
+        fcolour = str(product.get("F COLOUR", ""))
+        size = str(product.get("SIZE", ""))
+
+        # Print label block with all details
+        st.markdown(f"""
 <div class="print-label-block">
-    <img src="data:image/png;base64,{barcode_b64}" width="220" />
-    <div style="text-align:center;font-size:18px;margin-bottom:10px;">{clean_barcode(barcode_value)}</div>
+    <img src="data:{MIME_TYPES[LABEL_IMAGE_FORMAT]};base64,{barcode_b64}" width="220" />
+    <div style="text-align:center;font-size:18px;margin-bottom:10px;">{product["BARCODE_CLEAN"]}</div>
     <div style="font-size:32px;font-weight:bold;text-align:center;">{rrp_display}</div>
     <div style="text-align:center;font-size:18px;margin-bottom:10px;">Inc GST</div>
     <div style="font-size:18px;margin-top:10px;margin-bottom:0;text-align:left;line-height:1.3;">
@@ -103,13 +100,108 @@ else:
 </div>
 """, unsafe_allow_html=True)
 
-    # Print button using streamlit-js-eval
-    if st.button("Print Label"):
-        streamlit_js_eval(js_expressions="window.print()", key="print_dialog")
-        st.info("Print dialog opened. Please select your printer and print the label.")
+        # Print button using streamlit-js-eval
+        if st.button("Print Label"):
+            streamlit_js_eval(js_expressions="window.print()", key="print_dialog")
+            st.info("Print dialog opened. Please select your printer and print the label.")
+
+    with st.expander("🖨️ Batch Label Sheet"):
+        st.write("Print a whole shipment at once: pick products by filter or paste scanned barcodes.")
+        batch_mode = st.radio("Select products by", ["Filter inventory", "Paste barcodes"], horizontal=True, key="batch_mode")
+        if batch_mode == "Filter inventory":
+            filter_columns = [c for c in ["MANUFACTURER", "SUPPLIER", "LOCATION", "F GROUP", "MODEL"] if c in df.columns]
+            filter_col = st.selectbox("Filter column", filter_columns, key="batch_filter_col")
+            filter_values = st.multiselect(
+                "Values", sorted(df[filter_col].dropna().astype(str).unique()), key="batch_filter_values"
+            )
+            batch_df = df[df[filter_col].astype(str).isin(filter_values)] if filter_values else df.iloc[0:0]
+        else:
+            pasted = st.text_area("Barcodes (one per line; repeat a barcode for extra copies)", key="batch_barcodes")
+            with timed("normalize"):
+                wanted = [clean_barcode(line) for line in pasted.splitlines() if line.strip()]
+            first_match = df.reset_index().drop_duplicates("BARCODE_CLEAN").set_index("BARCODE_CLEAN")["index"]
+            found = [code for code in wanted if code in first_match.index]
+            missing_codes = sorted(set(wanted) - set(found))
+            if missing_codes:
+                st.warning(f"Not in inventory: {', '.join(missing_codes)}")
+            batch_df = df.loc[first_match[found].tolist()] if found else df.iloc[0:0]
+        st.write(f"{len(batch_df)} labels selected.")
+        layout_cols = st.columns(5)
+        page_size = layout_cols[0].selectbox("Page", list(PAGE_SIZES_MM), key="batch_page_size")
+        grid_columns = layout_cols[1].number_input("Columns", min_value=1, max_value=10, value=3, key="batch_columns")
+        grid_rows = layout_cols[2].number_input("Rows", min_value=1, max_value=20, value=8, key="batch_rows")
+        margin_mm = layout_cols[3].number_input("Margin (mm)", min_value=0.0, max_value=30.0, value=8.0, key="batch_margin")
+        sheet_format = layout_cols[4].selectbox("Format", ["pdf", "png"], key="batch_format")
+        if st.button("Generate Label Sheet", disabled=batch_df.empty):
+            page_w, page_h = PAGE_SIZES_MM[page_size]
+            layout = SheetLayout(
+                columns=int(grid_columns), rows=int(grid_rows),
+                page_width_mm=page_w, page_height_mm=page_h, margin_mm=float(margin_mm),
+            )
+            started = time.perf_counter()
+            with timed("render"):
+                sheet = build_label_sheet(strip_derived_columns(batch_df).to_dict("records"), layout, fmt=sheet_format)
+            elapsed = time.perf_counter() - started
+            st.success(f"{len(batch_df)} labels in {elapsed:.2f}s ({len(batch_df) / elapsed:.0f} labels/s)")
+            st.session_state["label_sheet"] = (sheet, sheet_format)
+        if st.session_state.get("label_sheet"):
+            sheet, sheet_format = st.session_state["label_sheet"]
+            st.download_button(
+                label=f"Download Label Sheet ({sheet_format.upper()})",
+                data=sheet,
+                file_name=f"labels.{sheet_format}",
+                mime="application/pdf" if sheet_format == "pdf" else "image/png",
+            )
+
+    with st.expander("🏷️ Thermal Printer (ZPL/EPL)"):
+        st.write("Send labels straight to a Zebra-compatible printer; bars are drawn by the printer, no images needed.")
+        thermal_source = st.radio(
+            "Labels for", ["Chosen product", "Batch selection above"], horizontal=True, key="thermal_source"
+        )
+        if thermal_source == "Chosen product":
+            if selected_idx is None:
+                st.info("Choose a product above first.")
+            thermal_df = df.loc[[selected_idx]] if selected_idx is not None else df.iloc[:0]
+        else:
+            thermal_df = batch_df
+        thermal_cols = st.columns(3)
+        language_names = list(LANGUAGES)
+        language = thermal_cols[0].selectbox(
+            "Language", language_names, index=language_names.index(THERMAL_LABEL_LANGUAGE), key="thermal_language",
+            format_func=str.upper,
+        )
+        copies = thermal_cols[1].number_input("Copies of each", min_value=1, max_value=100, value=1, key="thermal_copies")
+        destination = thermal_cols[2].selectbox(
+            "Send to", ["Download", "Network printer", "File / spool path"], key="thermal_destination"
+        )
+        if destination == "Network printer":
+            printer_host = st.text_input("Printer host", value=THERMAL_PRINTER_HOST or "", key="thermal_host")
+            printer_port = st.number_input("Port", min_value=1, max_value=65535, value=THERMAL_PRINTER_PORT, key="thermal_port")
+        elif destination == "File / spool path":
+            spool_path = st.text_input("Path", value=f"labels.{language}", key="thermal_path")
+        st.write(f"{len(thermal_df) * int(copies)} labels.")
+        if not thermal_df.empty:
+            records = strip_derived_columns(thermal_df).to_dict("records")
+            with timed("render"):
+                job = build_thermal_labels([r for r in records for _ in range(int(copies))], language)
+            if destination == "Download":
+                st.download_button(
+                    label=f"Download {language.upper()}", data=job, file_name=f"labels.{language}", mime="text/plain"
+                )
+            elif st.button(f"Send {language.upper()}"):
+                try:
+                    if destination == "Network printer":
+                        send_to_printer(job, printer_host.strip(), int(printer_port))
+                    else:
+                        write_labels(job, spool_path)
+                    st.success(f"Sent {len(job)} bytes.")
+                except (OSError, ValueError) as e:
+                    st.error(f"Could not send labels: {e}")
 
 st.markdown("---")
 st.write("For best results, use landscape mode and set margins to minimum when printing.")
 
 with st.expander("Show inventory table"):
-    st.dataframe(df, use_container_width=True)
+    show_table_page(main_table, "label_inventory_table")
+
+show_timing_panel()
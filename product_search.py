@@ -0,0 +1,176 @@
+import re
+import bisect
+import threading
+import numpy as np
+import pandas as pd
+
+# Columns searched by the product pickers (the barcode too, so a code read off a torn label still works)
+SEARCH_COLUMNS = ["MODEL", "MANUFACTURER", "F COLOUR", "FRAME NO.", "BARCODE"]
+# Matches offered by a product picker
+SEARCH_LIMIT = 20
+# Share of a word's trigrams a token must contain to count as a fuzzy match
+TRIGRAM_THRESHOLD = 0.5
+# Score of a query word that matches a token exactly, as a prefix, or fuzzily (times the trigram share)
+EXACT_SCORE, PREFIX_SCORE, FUZZY_SCORE = 1.0, 0.9, 0.8
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+
+def tokenize(text):
+    return _TOKEN.findall(str(text).lower())
+
+def trigrams(token):
+    padded = f"  {token} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+def _group(keys, members):
+    """Distinct (key, member) pairs grouped by key: (sorted keys, offsets, members).
+
+    The members of keys[i] are members[offsets[i]:offsets[i + 1]], in ascending order.
+    """
+    codes, uniques = pd.factorize(keys)
+    order = np.argsort(uniques.astype(str), kind="stable")
+    rank = np.empty(len(uniques), dtype=np.int64)
+    rank[order] = np.arange(len(uniques))
+    width = int(members.max()) + 1 if len(members) else 1
+    pairs = np.sort(rank[codes] * width + members)
+    pairs = pairs[np.concatenate(([True], pairs[1:] != pairs[:-1]))]
+    offsets = np.searchsorted(pairs // width, np.arange(len(uniques) + 1))
+    return uniques[order].tolist(), offsets.astype(np.int64), pairs % width
+
+class SearchIndex:
+    """Prefix and trigram search over the product columns, built once per inventory version.
+
+    Tokens are kept sorted with the rows holding each one laid out contiguously, so a prefix is
+    a bisect plus one slice; trigrams map to token ids, so fuzzy matching only scores distinct
+    tokens and then fans out to their rows.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        self._df = None
+        self._tokens = []
+        self._offsets = np.zeros(1, dtype=np.int64)
+        self._rows = np.zeros(0, dtype=np.int64)
+        self._trigrams = {}
+
+    def sync(self, version, df):
+        with self._lock:
+            if self._version == version:
+                return
+            self._build(df)
+            self._version = version
+
+    def _build(self, df):
+        tokens, rows = [], []
+        for column in SEARCH_COLUMNS:
+            if column not in df.columns:
+                continue
+            values = df[column]
+            text = values.astype(str).where(values.notna(), "").str.lower().reset_index(drop=True)
+            found = text.str.findall(_TOKEN.pattern).explode().dropna()
+            # The value run together as well, so "rayban" finds "Ray-Ban"
+            joined = text.str.replace(r"[^a-z0-9]+", "", regex=True)
+            joined = joined[joined != ""]
+            tokens += [found.to_numpy(dtype=object), joined.to_numpy(dtype=object)]
+            rows += [found.index.to_numpy(dtype=np.int64), joined.index.to_numpy(dtype=np.int64)]
+        tokens = np.concatenate(tokens) if tokens else np.zeros(0, dtype=object)
+        rows = np.concatenate(rows) if rows else np.zeros(0, dtype=np.int64)
+        self._tokens, self._offsets, self._rows = _group(tokens, rows)
+        # (trigram, token id) pairs, grouped by trigram the same way rows are grouped by token
+        padded = pd.Series(self._tokens, dtype=object).map(lambda t: f"  {t} ")
+        longest = int(padded.str.len().max()) if len(padded) else 0
+        grams, token_ids = [], []
+        for i in range(longest - 2):
+            gram = padded.str.slice(i, i + 3).to_numpy(dtype=object)
+            full = padded.str.len().to_numpy() >= i + 3
+            grams.append(gram[full])
+            token_ids.append(np.flatnonzero(full))
+        grams = np.concatenate(grams) if grams else np.zeros(0, dtype=object)
+        token_ids = np.concatenate(token_ids) if token_ids else np.zeros(0, dtype=np.int64)
+        names, offsets, members = _group(grams, token_ids)
+        self._trigrams = {name: members[offsets[i]:offsets[i + 1]] for i, name in enumerate(names)}
+        self._df = df
+
+    def _rows_of(self, token_ids):
+        # Rows of several tokens at once, plus which of the given tokens each row came from
+        starts, ends = self._offsets[token_ids], self._offsets[token_ids + 1]
+        lengths = ends - starts
+        owner = np.repeat(np.arange(len(token_ids)), lengths)
+        positions = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths) + np.repeat(starts, lengths)
+        return self._rows[positions], owner
+
+    def _word_scores(self, word, n):
+        scores = np.zeros(n, dtype=np.float32)
+        lo = bisect.bisect_left(self._tokens, word)
+        hi = bisect.bisect_left(self._tokens, word + "\uffff", lo)
+        if lo < hi:
+            scores[self._rows[self._offsets[lo]:self._offsets[hi]]] = PREFIX_SCORE
+            if self._tokens[lo] == word:
+                scores[self._rows[self._offsets[lo]:self._offsets[lo + 1]]] = EXACT_SCORE
+        grams = trigrams(word)
+        postings = [self._trigrams[g] for g in grams if g in self._trigrams]
+        if postings:
+            counts = np.bincount(np.concatenate(postings), minlength=len(self._tokens))
+            token_ids = np.flatnonzero(counts >= TRIGRAM_THRESHOLD * len(grams))
+            if len(token_ids):
+                token_scores = (FUZZY_SCORE * counts[token_ids] / len(grams)).astype(np.float32)
+                rows, owner = self._rows_of(token_ids)
+                np.maximum.at(scores, rows, token_scores[owner])
+        return scores
+
+    def search(self, query, limit=SEARCH_LIMIT):
+        """Row ids of the best matches for `query`, best first (ties in stored order)."""
+        words = tokenize(query)
+        if not words or self._df is None:
+            return []
+        n = len(self._df)
+        total = np.zeros(n, dtype=np.float32)
+        for word in words:
+            total += self._word_scores(word, n)
+        found = np.flatnonzero(total)
+        if len(found) > limit:
+            found = found[np.argpartition(-total[found], limit - 1)[:limit]]
+            # Rows tied with the cut-off score may have been dropped arbitrarily: keep the earliest instead
+            cutoff = total[found].min()
+            better = np.flatnonzero(total > cutoff)
+            tied = np.flatnonzero(total == cutoff)[:limit - len(better)]
+            found = np.concatenate([better, tied])
+        found = found[np.lexsort((found, -total[found]))]
+        return self._df.index[found].tolist()
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+def get_search_index(table):
+    """Process-wide search index for `table`, in step with its current inventory version."""
+    with _indexes_lock:
+        index = _indexes.setdefault(table.name, SearchIndex())
+    index.sync(table.version(), table.load_cached())
+    return index
+
+def product_label(product):
+    parts = [product.get("BARCODE_CLEAN", ""), product.get("FRAME_CLEAN", "")]
+    details = " ".join(str(product.get(c, "")) for c in ("MODEL", "MANUFACTURER", "F COLOUR") if pd.notna(product.get(c)))
+    return " - ".join(str(p) for p in parts + [details] if str(p).strip())
+
+def pick_product(table, label, key):
+    """Search box plus a picker over its top matches; returns the chosen row id (or None).
+
+    With no search text the picker offers the first SEARCH_LIMIT rows as stored.
+    """
+    import streamlit as st
+    index = get_search_index(table)
+    df = table.load_cached()
+    # A new search starts the picker again at its best match
+    query = st.text_input(
+        f"{label} (search model, manufacturer, colour, framecode or barcode)",
+        key=f"{key}_search",
+        on_change=lambda: st.session_state.pop(key, None),
+    )
+    row_ids = index.search(query) if query.strip() else df.index[:SEARCH_LIMIT].tolist()
+    if not row_ids:
+        st.info("No products match that search.")
+        return None
+    labels = {row_id: product_label(df.loc[row_id]) for row_id in row_ids}
+    return st.selectbox(label, options=row_ids, format_func=labels.get, key=key)
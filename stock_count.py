@@ -0,0 +1,139 @@
+import argparse
+import openpyxl
+import pandas as pd
+from barcode_utils import clean_barcode_series
+from inventory_storage import get_table, BARCODE_COLUMN
+
+# Rows parsed per chunk; memory stays bounded by this plus the number of distinct barcodes
+SCAN_CHUNK_ROWS = 200_000
+SCAN_FILE_TYPES = ["csv", "xlsx", "txt"]
+VARIANCE_COLUMNS = ["EXPECTED", "COUNTED", "VARIANCE", "STATUS", "RRP VALUE", "COST VALUE"]
+
+def _file_type(name):
+    file_type = name.rsplit(".", 1)[-1].lower()
+    if file_type not in SCAN_FILE_TYPES:
+        raise ValueError(f"Unsupported file type '{file_type}'. Choose from: {', '.join(SCAN_FILE_TYPES)}")
+    return file_type
+
+def _read_csv(source, file_type, **kwargs):
+    # .txt dumps may be tab or comma separated; let pandas sniff them as before
+    if file_type == "txt":
+        return pd.read_csv(source, delimiter=None, engine="python", **kwargs)
+    return pd.read_csv(source, **kwargs)
+
+def _xlsx_rows(source):
+    wb = openpyxl.load_workbook(source, read_only=True, data_only=True)
+    try:
+        rows = wb.active.iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        yield [str(c) if c is not None else f"Unnamed: {i}" for i, c in enumerate(header)]
+        yield from rows
+    finally:
+        wb.close()
+
+def preview_scan_file(source, name, rows=5):
+    """First few rows of a scan file, for the preview and the column picker."""
+    file_type = _file_type(name)
+    if file_type == "xlsx":
+        data = _xlsx_rows(source)
+        header = next(data, [])
+        preview = pd.DataFrame([row for _, row in zip(range(rows), data)], columns=header)
+    else:
+        preview = _read_csv(source, file_type, nrows=rows)
+    if hasattr(source, "seek"):
+        source.seek(0)
+    return preview
+
+def iter_scan_chunks(source, name, column, chunk_rows=SCAN_CHUNK_ROWS):
+    """Yield the raw values of `column` in chunks, never holding the whole file as a frame."""
+    file_type = _file_type(name)
+    if file_type != "xlsx":
+        for chunk in _read_csv(source, file_type, usecols=[column], chunksize=chunk_rows):
+            yield chunk[column]
+        return
+    data = _xlsx_rows(source)
+    position = next(data, []).index(column)
+    values = []
+    for row in data:
+        values.append(row[position] if position < len(row) else None)
+        if len(values) >= chunk_rows:
+            yield pd.Series(values)
+            values = []
+    if values:
+        yield pd.Series(values)
+
+def count_scans(chunks):
+    """Multiset of normalized barcodes (barcode -> times scanned) plus the number of blank scans."""
+    counts = pd.Series(dtype="int64")
+    blanks = 0
+    for chunk in chunks:
+        keys = clean_barcode_series(chunk)
+        blank = keys == ""
+        blanks += int(blank.sum())
+        counts = counts.add(keys[~blank].value_counts(), fill_value=0)
+    return counts.astype("int64"), blanks
+
+def _number(df, column, default):
+    if column not in df.columns:
+        return pd.Series(default, index=df.index, dtype="float64")
+    return pd.to_numeric(df[column], errors="coerce")
+
+def expected_stock(df):
+    """Expected units per normalized barcode: QUANTITY summed over rows (1 per row if there is no column)."""
+    df = df[df["BARCODE_CLEAN"] != ""]
+    stock = pd.DataFrame({
+        "BARCODE_CLEAN": df["BARCODE_CLEAN"],
+        "EXPECTED": _number(df, "QUANTITY", 1).fillna(0),
+        "RRP": _number(df, "RRP", float("nan")),
+        "COST PRICE": _number(df, "COST PRICE", float("nan")),
+    })
+    return stock.groupby("BARCODE_CLEAN", sort=False).agg(
+        {"EXPECTED": "sum", "RRP": "first", "COST PRICE": "first"}
+    )
+
+def reconcile(df, counts):
+    """Join expected stock against scan counts; one row per barcode seen on either side.
+
+    STATUS is matched, over, short or unexpected (scanned but not in inventory). VARIANCE is
+    counted minus expected, and the value columns price it at RRP and COST PRICE.
+    """
+    report = expected_stock(df).join(counts.rename("COUNTED"), how="outer")
+    unexpected = report["EXPECTED"].isna()
+    report["EXPECTED"] = report["EXPECTED"].fillna(0)
+    report["COUNTED"] = report["COUNTED"].fillna(0).astype("int64")
+    report["VARIANCE"] = report["COUNTED"] - report["EXPECTED"]
+    report["STATUS"] = "matched"
+    report.loc[report["VARIANCE"] > 0, "STATUS"] = "over"
+    report.loc[report["VARIANCE"] < 0, "STATUS"] = "short"
+    report.loc[unexpected, "STATUS"] = "unexpected"
+    report["RRP VALUE"] = report["VARIANCE"] * report["RRP"]
+    report["COST VALUE"] = report["VARIANCE"] * report["COST PRICE"]
+    report.index.name = BARCODE_COLUMN
+    return report[VARIANCE_COLUMNS]
+
+def summarize(report):
+    """Item count and value impact per status."""
+    return report.groupby("STATUS").agg(
+        ITEMS=("VARIANCE", "size"), UNITS=("VARIANCE", "sum"),
+        **{"RRP VALUE": ("RRP VALUE", "sum"), "COST VALUE": ("COST VALUE", "sum")},
+    )
+
+def reconcile_scan_file(df, source, name, column, chunk_rows=SCAN_CHUNK_ROWS):
+    counts, blanks = count_scans(iter_scan_chunks(source, name, column, chunk_rows))
+    return reconcile(df, counts), blanks
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Reconcile a stock count scan file against the inventory.")
+    parser.add_argument("path", help="csv, txt or xlsx file of scanned barcodes")
+    parser.add_argument("--column", default=None, help="barcode column (default: the first column)")
+    parser.add_argument("--table", default="main")
+    parser.add_argument("--output", default=None, help="write the variance report to this csv file")
+    args = parser.parse_args()
+    column = args.column or preview_scan_file(args.path, args.path, rows=1).columns[0]
+    report, blanks = reconcile_scan_file(get_table(args.table).load_cached(), args.path, args.path, column)
+    print(summarize(report).to_string())
+    print(f"Blank scans skipped: {blanks}")
+    if args.output:
+        report.to_csv(args.output)
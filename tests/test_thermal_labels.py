@@ -0,0 +1,47 @@
+import os
+import re
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import pytest
+from thermal_labels import ThermalLayout, epl_label, zpl_label
+
+# Every printed field filled in, and long enough to use the full line
+MAXIMAL_PRODUCT = {
+    "barcode": "2000000000015",
+    "rrp": "$9999.99",
+    "framecode": "ESS000001",
+    "model": "M" * 40,
+    "manufacturer": "Manufacturer " * 3,
+    "colour": "C" * 20,
+    "size": "55-18-145",
+}
+EPL_FONT_HEIGHTS = {1: 12, 2: 16, 3: 20, 4: 24, 5: 48}
+LAYOUTS = [ThermalLayout(), ThermalLayout(height_dots=203), ThermalLayout(width_dots=812, height_dots=406)]
+
+def _epl_text_rows(job):
+    # A<x>,<top>,<rotation>,<font>,<h mult>,<v mult>,...
+    rows = []
+    for line in job.splitlines():
+        match = re.match(r"A\d+,(\d+),0,(\d),\d+,(\d+),", line)
+        if match:
+            top, font, v_mult = map(int, match.groups())
+            rows.append((top, EPL_FONT_HEIGHTS[font] * v_mult))
+    return rows
+
+def _zpl_text_rows(job):
+    return [(int(top), int(height)) for top, height in re.findall(r"\^FO\d+,(\d+)\^A0N,(\d+),\d+", job)]
+
+@pytest.mark.parametrize("layout", LAYOUTS)
+@pytest.mark.parametrize("render, text_rows", [(epl_label, _epl_text_rows), (zpl_label, _zpl_text_rows)])
+def test_maximal_label_text_fits_the_label(layout, render, text_rows):
+    rows = text_rows(render(MAXIMAL_PRODUCT, layout))
+    planned = [layout.rows()[key] for key in ("barcode", "rrp", "model", "details")]
+    assert [top for top, _ in rows] == [top for top, _ in planned]
+    for (_, height), (_, room) in zip(rows, planned):
+        assert height <= room
+    for (top, height), (next_top, _) in zip(rows, rows[1:]):
+        assert top + height <= next_top
+    top, height = rows[-1]
+    assert top + height <= layout.height_dots
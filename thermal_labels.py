@@ -0,0 +1,105 @@
+import os
+import socket
+from dataclasses import dataclass
+from labels import label_fields
+
+# Thermal printers draw Code128 natively from ZPL/EPL commands, so no image is ever encoded:
+# a label is a few hundred bytes of text. Set THERMAL_PRINTER_HOST to send to a networked
+# printer's raw port, or write to a file / spool device such as /dev/usb/lp0.
+THERMAL_PRINTER_HOST = os.environ.get("THERMAL_PRINTER_HOST") or None
+THERMAL_PRINTER_PORT = int(os.environ.get("THERMAL_PRINTER_PORT", "9100"))
+THERMAL_LABEL_LANGUAGE = os.environ.get("THERMAL_LABEL_LANGUAGE", "zpl")
+
+@dataclass(frozen=True)
+class ThermalLayout:
+    # Defaults: a 57 x 32 mm (2.25" x 1.25") label on a 203 dpi printer
+    width_dots: int = 456
+    height_dots: int = 254
+    left_dots: int = 20
+    module_width: int = 2
+
+    def rows(self):
+        """Top offsets of the bars and the four text lines, and the text heights."""
+        h = self.height_dots
+        return {
+            "bars": (int(h * 0.05), int(h * 0.24)),
+            "barcode": (int(h * 0.31), int(h * 0.09)),
+            "rrp": (int(h * 0.41), int(h * 0.14)),
+            "model": (int(h * 0.58), int(h * 0.09)),
+            "details": (int(h * 0.69), int(h * 0.09)),
+        }
+
+def _text_lines(fields):
+    return {
+        "barcode": fields["barcode"],
+        "rrp": f'{fields["rrp"]} Inc GST',
+        "model": f'{fields["framecode"]}  {fields["model"]}'.strip(),
+        "details": f'{fields["manufacturer"]}  {fields["colour"]}  {fields["size"]}'.strip(),
+    }
+
+def _zpl_data(text):
+    # ^FH_ lets the field carry the command characters as hex escapes
+    return "^FH_^FD" + text.replace("_", "_5F").replace("^", "_5E").replace("~", "_7E") + "^FS"
+
+def zpl_label(fields, layout=ThermalLayout(), copies=1):
+    rows = layout.rows()
+    x = layout.left_dots
+    parts = ["^XA^CI28", f"^PW{layout.width_dots}^LL{layout.height_dots}"]
+    if fields["barcode"]:
+        top, height = rows["bars"]
+        parts.append(f"^FO{x},{top}^BY{layout.module_width}^BCN,{height},N,N,N" + _zpl_data(fields["barcode"]))
+    for key, text in _text_lines(fields).items():
+        top, height = rows[key]
+        parts.append(f"^FO{x},{top}^A0N,{height},{height}" + _zpl_data(text))
+    parts.append(f"^PQ{copies}^XZ")
+    return "\n".join(parts) + "\n"
+
+def _epl_data(text):
+    return '"' + text.replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+# EPL has fixed bitmap fonts; pick the largest one that fits each line's height
+_EPL_FONTS = [(5, 48), (4, 24), (3, 20), (2, 16), (1, 12)]
+
+def _epl_font(height):
+    return next((font for font, dots in _EPL_FONTS if dots <= height), 1)
+
+def epl_label(fields, layout=ThermalLayout(), copies=1):
+    rows = layout.rows()
+    x = layout.left_dots
+    parts = ["", "N", f"q{layout.width_dots}", f"Q{layout.height_dots},24"]
+    if fields["barcode"]:
+        top, height = rows["bars"]
+        narrow = layout.module_width
+        parts.append(f"B{x},{top},0,1,{narrow},{narrow * 2},{height},N," + _epl_data(fields["barcode"]))
+    for key, text in _text_lines(fields).items():
+        top, height = rows[key]
+        parts.append(f"A{x},{top},0,{_epl_font(height)},1,1,N," + _epl_data(text))
+    parts.append(f"P{copies}")
+    return "\n".join(parts) + "\n"
+
+LANGUAGES = {"zpl": (zpl_label, "utf-8"), "epl": (epl_label, "latin-1")}
+
+def build_thermal_labels(products, language=THERMAL_LABEL_LANGUAGE, layout=ThermalLayout()):
+    """One print job for `products` (row dicts). Repeats in a row become a single label with a copy count."""
+    if language not in LANGUAGES:
+        raise ValueError(f"Unknown label language '{language}'. Choose from: {', '.join(LANGUAGES)}")
+    make_label, encoding = LANGUAGES[language]
+    jobs = []
+    for fields in map(label_fields, products):
+        if jobs and jobs[-1][0] == fields:
+            jobs[-1][1] += 1
+        else:
+            jobs.append([fields, 1])
+    return "".join(make_label(fields, layout, copies) for fields, copies in jobs).encode(encoding, errors="replace")
+
+def write_labels(data, path):
+    """Write a print job to a file or a spool device (e.g. /dev/usb/lp0)."""
+    with open(path, "wb") as f:
+        f.write(data)
+
+def send_to_printer(data, host=THERMAL_PRINTER_HOST, port=THERMAL_PRINTER_PORT, timeout=10):
+    """Send a print job to a printer's raw TCP port (JetDirect, 9100 by default)."""
+    if not host:
+        raise ValueError("No printer host given; set THERMAL_PRINTER_HOST.")
+    with socket.create_connection((host, port), timeout=timeout) as conn:
+        conn.sendall(data)
@@ -0,0 +1,80 @@
+import io
+import os
+import pickle
+import hashlib
+import tempfile
+import pandas as pd
+
+# Parsed workbooks are kept in a pickle sidecar next to the xlsx, so a restarted process loads
+# the frame instead of parsing the workbook again. Set to 0 to always parse the xlsx.
+WORKBOOK_CACHE = os.environ.get("INVENTORY_WORKBOOK_CACHE", "1") != "0"
+SIDECAR_SUFFIX = ".frame.pkl"
+SIDECAR_FORMAT = 1
+
+def sidecar_path(path):
+    return path + SIDECAR_SUFFIX
+
+def _source_tag(stat):
+    return (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+
+def _read_tag(path):
+    # The tag is pickled ahead of the frame, so a stale sidecar is rejected without unpickling the frame
+    try:
+        f = open(sidecar_path(path), "rb")
+    except FileNotFoundError:
+        return None, None
+    try:
+        tag = pickle.load(f)
+        if not isinstance(tag, dict) or tag.get("format") != SIDECAR_FORMAT:
+            f.close()
+            return None, None
+        return tag, f
+    except Exception:
+        f.close()
+        return None, None
+
+def _write_sidecar(path, tag, df):
+    directory, base = os.path.split(sidecar_path(path))
+    fd, tmp_path = tempfile.mkstemp(prefix=base + ".", suffix=".tmp", dir=directory or ".")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            pickle.dump(tag, f, protocol=pickle.HIGHEST_PROTOCOL)
+            pickle.dump(df, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, sidecar_path(path))
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+def read_workbook(path):
+    """pd.read_excel(path), served from the sidecar when it was made from this exact file.
+
+    The sidecar is fresh when the workbook's inode, size and mtime match its tag or, failing
+    that, its SHA-256 does (a copied or touched workbook keeps its sidecar). Anything else
+    re-parses the xlsx and rewrites the sidecar.
+    """
+    if not WORKBOOK_CACHE:
+        return pd.read_excel(path)
+    with open(path, "rb") as source:
+        stat = os.fstat(source.fileno())
+        data = None
+        tag, f = _read_tag(path)
+        if tag is not None:
+            with f:
+                try:
+                    if tag["source"] != _source_tag(stat):
+                        data = source.read()
+                        if tag["sha256"] != hashlib.sha256(data).hexdigest():
+                            raise LookupError("stale sidecar")
+                    return pickle.load(f)
+                except Exception:
+                    pass  # stale, torn or foreign sidecar: parse the workbook
+        if data is None:
+            data = source.read()
+    df = pd.read_excel(io.BytesIO(data))
+    tag = {"format": SIDECAR_FORMAT, "source": _source_tag(stat), "sha256": hashlib.sha256(data).hexdigest()}
+    try:
+        _write_sidecar(path, tag, df)
+    except OSError:
+        pass  # read-only directory: keep serving from the workbook
+    return df